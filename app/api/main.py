@@ -1,22 +1,46 @@
 # app/api/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
-from app.models.base import Base, engine
+from app.core.metrics import MetricsMiddleware, render_prometheus
+from app.core.profiling import ProfilingMiddleware
+from app.services.report_batch import shutdown_render_pool
+from app.services.jobs import resume_jobs, shutdown_job_pool
 
 # Importações das rotas
 from app.api.routes_ingest import router as ingest_router
 from app.api.routes_kpi import router as kpi_router
 from app.api.routes_reports import router as reports_router
 from app.api.routes_fazendas import router as fazendas_router  # ✅ NOVO
+from app.api.routes_profiles import router as profiles_router
+from app.api.routes_jobs import router as jobs_router
 
-# Cria as tabelas no banco (se ainda não existirem)
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema e backfill dos buckets mensais no startup, não na importação
+    if settings.AUTO_MIGRATE:
+        from app.models.migrate import migrate
+
+        await run_in_threadpool(migrate)
+    # Jobs que ficaram pendentes (ou interrompidos) voltam para a fila
+    await run_in_threadpool(resume_jobs)
+    if settings.KPI_ENGINE:
+        from app.services.kpi_engine import preload
+
+        preload()
+    yield
+    # Encerra os pools de jobs e de renderização de relatórios junto com a API
+    shutdown_job_pool()
+    shutdown_render_pool()
 
 # Instância principal do FastAPI
 app = FastAPI(
     title="AgroVet Metrics API",
     version="1.0.0",
+    lifespan=lifespan,
     description=(
         "MVP para manejo reprodutivo bovino: ingestão de dados, cálculo de KPIs, "
         "comparativos e relatórios PDF/XLSX."
@@ -32,13 +56,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latência por rota, SQL por requisição (Server-Timing) e métricas em /metrics
+app.add_middleware(MetricsMiddleware)
+# Profiling opt-in por requisição (PROFILING_ENABLED + X-Profile: 1)
+app.add_middleware(ProfilingMiddleware)
+
 # Registro das rotas principais
 app.include_router(ingest_router, prefix="/ingest", tags=["ingest"])
 app.include_router(kpi_router, prefix="/kpi", tags=["kpi"])
 app.include_router(reports_router, prefix="/relatorio", tags=["relatorios"])
 app.include_router(fazendas_router, prefix="/fazendas", tags=["fazendas"])  # ✅ Correção segura
+app.include_router(profiles_router, prefix="/profiles", tags=["profiling"])
+app.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
 
 # Endpoint simples de verificação (healthcheck)
 @app.get("/", tags=["health"])
 def healthcheck():
     return {"status": "ok", "service": "AgroVet Metrics API"}
+
+# Métricas no formato texto do Prometheus
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
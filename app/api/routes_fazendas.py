@@ -1,16 +1,51 @@
 # app/api/routes_fazendas.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.models.base import get_db
-from app.models.fazenda import Fazenda
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.base import get_async_db
+from app.models.fazenda import Fazenda, nome_busca
+from app.schemas.fazendas import FazendaPage
 
 router = APIRouter(tags=["Fazendas"])
 
+FIM_PREFIXO = "\U0010ffff"  # maior code point: prefixo + FIM_PREFIXO vem depois de todo nome com o prefixo
 
-@router.get("/", summary="Lista todas as fazendas")
-def listar_fazendas(db: Session = Depends(get_db)):
+
+@router.get("/", summary="Lista as fazendas (paginado)", response_model=FazendaPage)
+async def listar_fazendas(
+    request: Request,
+    response: Response,
+    busca: str | None = Query(None, description="Prefixo do nome (sem diferenciar maiúsculas)"),
+    produtor: str | None = None,
+    municipio: str | None = None,
+    estado: str | None = None,
+    apos: str | None = Query(None, description="Cursor: nome da última fazenda da página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Retorna a lista de fazendas cadastradas no banco (id + nome)
+    Retorna id + nome das fazendas em ordem alfabética, paginando por cursor
+    (keyset sobre o índice único de `nome`): a próxima página começa depois
+    de `proximo`, sem OFFSET. O ETag muda quando fazendas são criadas ou removidas.
     """
-    fazendas = db.query(Fazenda).all()
-    return [{"id": f.id, "nome": f.nome} for f in fazendas]
+    maior_id, total = (await db.execute(select(func.max(Fazenda.id), func.count()).select_from(Fazenda))).one()
+    etag = f'"fazendas-{maior_id or 0}-{total}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    stmt = select(Fazenda.id, Fazenda.nome).order_by(Fazenda.nome).limit(limit + 1)
+    if busca:
+        # Faixa sobre lower(nome): busca no índice ix_fazendas_nome_lower* (o ILIKE varreria o índice todo)
+        chave = nome_busca(Fazenda.nome, db.bind.dialect.name)
+        prefixo = func.lower(busca)
+        stmt = stmt.where(chave >= prefixo, chave < prefixo.concat(FIM_PREFIXO))
+    if apos is not None:
+        stmt = stmt.where(Fazenda.nome > apos)
+    for col, valor in ((Fazenda.produtor, produtor), (Fazenda.municipio, municipio), (Fazenda.estado, estado)):
+        if valor is not None:
+            stmt = stmt.where(col == valor)
+
+    rows = (await db.execute(stmt)).all()
+    itens = [{"id": r.id, "nome": r.nome} for r in rows[:limit]]
+    return {"itens": itens, "proximo": itens[-1]["nome"] if len(rows) > limit else None}
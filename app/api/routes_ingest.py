@@ -1,31 +1,56 @@
+import os
+import tempfile
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from sqlalchemy.orm import Session
-from app.models.base import get_db
-from app.services.kpi import insert_mobile_input
-from app.etl.cleaning import normalize_excel
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.base import get_async_db
+from app.services.ingest import bulk_insert_inputs, bulk_insert_frame, new_stream_report, insert_stream_block
 from app.schemas.ingest import MobileInput, IngestReport
 
 router = APIRouter()
 
 @router.post("/mobile", response_model=IngestReport)
-def ingest_mobile(payloads: list[MobileInput], db: Session = Depends(get_db)):
-    warnings = []
-    for p in payloads:
-        try:
-            insert_mobile_input(db, p)
-        except Exception as e:
-            warnings.append(str(e))
-    return {"rows": len(payloads), "warnings": warnings}
+async def ingest_mobile(payloads: list[MobileInput], db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(bulk_insert_inputs, payloads)
 
 @router.post("/upload", response_model=IngestReport)
-def ingest_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def ingest_file(
+    file: UploadFile = File(...),
+    streaming: bool | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Importa CSV/XLSX. Em modo streaming (`streaming=true`, ou automático acima de
+    INGEST_STREAM_THRESHOLD_MB) o arquivo é lido, validado e gravado em blocos de
+    INGEST_CHUNK_ROWS linhas, com o progresso de cada bloco em `chunks`.
+    A leitura/validação (pandas) roda no threadpool; a gravação, na sessão assíncrona.
+    """
+    # pandas só é carregado no primeiro upload
+    from app.etl.cleaning import normalize_excel_batch, iter_normalized_chunks
+
     try:
-        temp_path = f"/tmp/{file.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(file.file.read())
-        rows, warnings = normalize_excel(temp_path)
-        for r in rows:
-            insert_mobile_input(db, r)
-        return {"rows": len(rows), "warnings": warnings}
+        # Copia o upload para o disco em blocos de tamanho fixo
+        suffix = os.path.splitext(file.filename or "")[1].lower()
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            while chunk := await file.read(settings.UPLOAD_COPY_CHUNK_BYTES):
+                f.write(chunk)
+            temp_path = f.name
+        try:
+            if streaming is None:
+                streaming = os.path.getsize(temp_path) > settings.INGEST_STREAM_THRESHOLD_MB * 1024 * 1024
+            if streaming:
+                report = new_stream_report()
+                blocos = iter_normalized_chunks(temp_path, settings.INGEST_CHUNK_ROWS)
+                while (bloco := await run_in_threadpool(next, blocos, None)) is not None:
+                    await db.run_sync(insert_stream_block, report, *bloco)
+                return report
+
+            lote, warnings = await run_in_threadpool(normalize_excel_batch, temp_path)
+            report = await db.run_sync(bulk_insert_frame, lote)
+            report["warnings"] = warnings + report["warnings"]
+            return report
+        finally:
+            os.remove(temp_path)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
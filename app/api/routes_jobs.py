@@ -0,0 +1,90 @@
+import os
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.base import get_async_db
+from app.schemas.jobs import JobStatus, RelatorioJobRequest
+from app.services import jobs
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    ".pdf": "application/pdf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+async def _enqueue(db: AsyncSession, response: Response, tipo: str, parametros: dict, job_id: str | None = None):
+    try:
+        status = await db.run_sync(jobs.enqueue, tipo, parametros, job_id)
+    except jobs.JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    response.headers["Location"] = f"/jobs/{status['id']}"
+    return status
+
+
+@router.post("/importacao", status_code=202, response_model=JobStatus)
+async def submit_importacao(
+    response: Response,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Importa um CSV/XLSX em segundo plano (mesmas regras de /ingest/upload em modo
+    streaming). Responde 202 com o job; acompanhe em /jobs/{id}.
+    """
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    if suffix not in (".csv", ".xlsx", ".xlsm", ".xls"):
+        raise HTTPException(status_code=400, detail=f"Formato de arquivo não suportado: {suffix or '?'}")
+    job_id = jobs.new_job_id()
+    path = jobs.job_file(job_id, f".entrada{suffix}")
+    # Copia o upload para o disco em blocos de tamanho fixo
+    with open(path, "wb") as f:
+        while chunk := await file.read(settings.UPLOAD_COPY_CHUNK_BYTES):
+            f.write(chunk)
+    try:
+        return await _enqueue(db, response, "importacao", {"arquivo": path, "nome": file.filename}, job_id)
+    except Exception:
+        os.remove(path)
+        raise
+
+
+@router.post("/relatorio", status_code=202, response_model=JobStatus)
+async def submit_relatorio(req: RelatorioJobRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Gera o relatório PDF/XLSX de uma fazenda em segundo plano (202 + id do job)."""
+    try:
+        parametros = jobs.validate_report_params(req.fazenda_id, req.inicio, req.fim, req.formato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _enqueue(db, response, "relatorio", parametros)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Status e progresso (0..1) do job; `download` aparece quando concluído."""
+    try:
+        job = await db.run_sync(jobs.get_job, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return jobs.job_status(job)
+
+
+@router.get("/{job_id}/resultado")
+async def get_job_result(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Arquivo gerado pelo job (relatórios) ou o relatório da importação em JSON."""
+    try:
+        job = await db.run_sync(jobs.get_job, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if job.status == jobs.ERRO:
+        raise HTTPException(status_code=409, detail=f"Job falhou: {job.erro}")
+    if job.status != jobs.CONCLUIDO:
+        raise HTTPException(status_code=409, detail=f"Job ainda não concluído ({job.status})")
+    if not job.arquivo:
+        return job.resultado
+    if not os.path.exists(job.arquivo):
+        raise HTTPException(status_code=410, detail="Resultado expirado")
+    ext = os.path.splitext(job.arquivo)[1]
+    return FileResponse(job.arquivo, media_type=MEDIA_TYPES.get(ext, "application/octet-stream"),
+                        filename=job.resultado.get("nome_arquivo") or os.path.basename(job.arquivo))
@@ -1,32 +1,142 @@
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.models.base import get_db
-from app.services.kpi import compute_kpis_for_farm, benchmark_metric
-from app.schemas.kpi import KPIResponse, BenchmarkResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.base import get_async_db
+from app.services.kpi import (
+    compute_kpis_for_farm, benchmark_metric, projected_calvings, kpi_series, aggregate_kpis,
+    cycle_kpis, farm_cycle_kpis,
+)
+from app.schemas.kpi import (
+    KPIResponse, BenchmarkResponse, CalendarioResponse, SerieResponse, AgregadoResponse,
+    CiclosResponse, CiclosFazendaResponse,
+)
 
 router = APIRouter()
 
+# Declarada antes de /{fazenda_id} para "agregado" não ser lido como id
+@router.get("/agregado", response_model=AgregadoResponse)
+async def get_agregado(
+    request: Request,
+    response: Response,
+    nivel: str,
+    inicio: date,
+    fim: date,
+    produtor: str | None = None,
+    municipio: str | None = None,
+    estado: str | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Totais e KPIs por produtor, município ou estado, com filtros opcionais.
+    Resultados ficam em cache por período; o ETag muda quando os dados mudam.
+    """
+    try:
+        resultado = await db.run_sync(aggregate_kpis, nivel, inicio, fim, produtor, municipio, estado)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    versao = resultado["versao"]
+    etag = f'"agregado-{versao}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return resultado
+
+@router.get("/ciclos", response_model=CiclosResponse)
+async def get_ciclos(
+    inicio: date | None = None,
+    fim: date | None = None,
+    ids: list[int] | None = Query(None, description="Ciclos a comparar (qualquer fazenda)"),
+    produtor: str | None = None,
+    municipio: str | None = None,
+    estado: str | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    KPIs por ciclo de todas as fazendas (ou dos ciclos em `ids`), lado a lado.
+    Com `inicio`/`fim`, só os ciclos que cruzam o período.
+    """
+    try:
+        ciclos = await db.run_sync(
+            cycle_kpis, None, inicio, fim, ids, produtor=produtor, municipio=municipio, estado=estado
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ciclos": ciclos, "total": len(ciclos)}
+
 @router.get("/{fazenda_id}", response_model=KPIResponse)
-def get_kpis(
+async def get_kpis(
     fazenda_id: int,
     inicio: date,
     fim: date,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        return compute_kpis_for_farm(db, fazenda_id, inicio, fim)
+        return await db.run_sync(compute_kpis_for_farm, fazenda_id, inicio, fim)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/benchmark/{metric}", response_model=BenchmarkResponse)
-def get_benchmark(
+async def get_benchmark(
     metric: str,
     inicio: date,
     fim: date,
-    db: Session = Depends(get_db)
+    limit: int | None = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    fazenda_id: int | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        return await db.run_sync(
+            benchmark_metric, metric, inicio, fim, limit=limit, offset=offset, fazenda_id=fazenda_id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{fazenda_id}/calendario", response_model=CalendarioResponse)
+async def get_calendario(
+    fazenda_id: int,
+    inicio: date | None = None,
+    fim: date | None = None,
+    granularidade: str = "semana",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Partos previstos por semana ou mês. Sem datas, cobre de hoje até hoje + 283 dias.
+    """
+    try:
+        return await db.run_sync(projected_calvings, fazenda_id, inicio, fim, granularidade)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{fazenda_id}/serie", response_model=SerieResponse)
+async def get_serie(
+    fazenda_id: int,
+    inicio: date,
+    fim: date,
+    granularidade: str = "mes",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Totais e KPIs por semana, mês ou trimestre, para gráficos de tendência.
+    """
+    try:
+        return await db.run_sync(kpi_series, fazenda_id, inicio, fim, granularidade)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{fazenda_id}/ciclos", response_model=CiclosFazendaResponse)
+async def get_ciclos_fazenda(
+    fazenda_id: int,
+    inicio: date | None = None,
+    fim: date | None = None,
+    ids: list[int] | None = Query(None, description="Ciclos a comparar"),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    KPIs de cada ciclo da fazenda em ordem cronológica, com a variação de
+    TS/TC/TP em relação ao ciclo anterior.
+    """
     try:
-        return benchmark_metric(db, metric, inicio, fim)
+        return await db.run_sync(farm_cycle_kpis, fazenda_id, inicio, fim, ids)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
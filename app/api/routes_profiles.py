@@ -0,0 +1,26 @@
+import os
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from app.core.config import settings
+from app.core import profiling
+
+router = APIRouter()
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, formato: str = "prof", limite: int = Query(40, ge=1, le=1000)):
+    """
+    Profile salvo de uma requisição (id do cabeçalho X-Profile-Id).
+    `formato=prof` baixa o arquivo pstats (snakeviz, pstats); `formato=texto`
+    mostra as `limite` funções com maior tempo acumulado.
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling desabilitado")
+    try:
+        path = profiling.profile_path(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+    if formato == "texto":
+        return PlainTextResponse(profiling.profile_text(profile_id, limite))
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
@@ -1,50 +1,120 @@
+import io
+import os
 from datetime import date
-from fastapi import APIRouter, Depends, Response, HTTPException
-from sqlalchemy.orm import Session
-from app.models.base import get_db
-from app.services.reports import build_pdf_report, build_xlsx_export
+from fastapi import APIRouter, Depends, Request, Response, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import REPORT_RENDER
+from app.models.base import get_async_db
+from app.schemas.reports import ReportBatchRequest
+from app.services import report_cache
+from app.services.kpi import compute_kpis_for_farm, compute_kpis_for_farms
+from app.services.report_batch import iter_zip, render_bytes, render_combined_bytes, run_in_render_pool
 
 router = APIRouter()
 
+MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+FILENAMES = {
+    "pdf": "Relatorio_Fazenda_{id}.pdf",
+    "xlsx": "Export_Fazenda_{id}.xlsx",
+}
+
+
+async def _report_response(request: Request, db: AsyncSession, fazenda_id: int, inicio: date, fim: date, fmt: str):
+    """
+    Serve o relatório pelo cache. A chave do cache é o ETag: se o cliente já tem
+    a versão atual (If-None-Match), responde 304 sem gerar nem ler o arquivo.
+    Em cache miss, a renderização (CPU-bound) roda no pool de processos.
+    """
+    key = await db.run_sync(report_cache.report_key, fazenda_id, inicio, fim, fmt)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    f = await run_in_threadpool(report_cache.open_cached, key, fmt)
+    if f is not None:
+        size = os.fstat(f.fileno()).st_size
+    else:
+        k = await db.run_sync(compute_kpis_for_farm, fazenda_id, inicio, fim)
+        with REPORT_RENDER.time(formato=fmt):
+            data = await run_in_render_pool(render_bytes, fmt, k, inicio, fim)
+        await run_in_threadpool(report_cache.store, key, fazenda_id, inicio, fim, fmt, data)
+        f, size = io.BytesIO(data), len(data)
+
+    filename = FILENAMES[fmt].format(id=fazenda_id)
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_iter_file(f), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+def _iter_file(f, chunk_size: int = 64 * 1024):
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
 @router.get("/fazenda/{fazenda_id}.pdf")
-def get_pdf_report(
+async def get_pdf_report(
     fazenda_id: int,
     inicio: date,
     fim: date,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        path = build_pdf_report(db, fazenda_id, inicio, fim)
-        with open(path, "rb") as f:
-            pdf_bytes = f.read()
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="Relatorio_Fazenda_{fazenda_id}.pdf"'
-            },
-        )
+        return await _report_response(request, db, fazenda_id, inicio, fim, "pdf")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/fazenda/{fazenda_id}.xlsx")
-def get_xlsx_export(
+async def get_xlsx_export(
     fazenda_id: int,
     inicio: date,
     fim: date,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        path = build_xlsx_export(db, fazenda_id, inicio, fim)
-        with open(path, "rb") as f:
-            xlsx_bytes = f.read()
-        return Response(
-            content=xlsx_bytes,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f'attachment; filename="Export_Fazenda_{fazenda_id}.xlsx"'
-            },
+        return await _report_response(request, db, fazenda_id, inicio, fim, "xlsx")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/lote")
+async def export_batch(req: ReportBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Relatórios de várias fazendas (lista de ids e/ou filtro por produtor/município/estado)
+    num ZIP enviado em streaming, ou num PDF único com `combinado=true`.
+    """
+    try:
+        if req.formato not in MEDIA_TYPES:
+            raise ValueError(f"Formato inválido: {req.formato}")
+        if req.combinado and req.formato != "pdf":
+            raise ValueError("O relatório combinado só existe em PDF")
+        ks = await db.run_sync(
+            compute_kpis_for_farms, req.inicio, req.fim, req.fazenda_ids, req.produtor, req.municipio, req.estado
+        )
+        if not ks:
+            raise ValueError("Nenhuma fazenda encontrada")
+
+        if req.combinado:
+            with REPORT_RENDER.time(formato="pdf_combinado"):
+                data = await run_in_render_pool(render_combined_bytes, ks, req.inicio, req.fim)
+            headers = {
+                "Content-Disposition": f'attachment; filename="Relatorios_{req.inicio}_{req.fim}.pdf"',
+                "Content-Length": str(len(data)),
+            }
+            return StreamingResponse(_iter_file(io.BytesIO(data)), media_type=MEDIA_TYPES["pdf"], headers=headers)
+
+        headers = {"Content-Disposition": f'attachment; filename="Relatorios_{req.inicio}_{req.fim}.zip"'}
+        return StreamingResponse(
+            iter_zip(ks, req.inicio, req.fim, req.formato), media_type="application/zip", headers=headers
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
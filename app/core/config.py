@@ -4,5 +4,47 @@ import os
 class Settings(BaseModel):
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./agrovet.db")
     CORS_ORIGINS: list[str] = ["*"]
+    # Cria/atualiza o schema no startup da API (0 = usar `python -m app.models.migrate`)
+    AUTO_MIGRATE: bool = os.getenv("AUTO_MIGRATE", "1") == "1"
+    # Pool de conexões (pool_size/max_overflow não se aplicam ao SQLite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos (-1 = nunca)
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    # SQLite: WAL + synchronous=NORMAL, espera por lock e caches (0 = pragmas padrão)
+    SQLITE_WAL: bool = os.getenv("SQLITE_WAL", "1") == "1"
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_MB: int = int(os.getenv("SQLITE_MMAP_MB", "256"))
+    SQLITE_CACHE_MB: int = int(os.getenv("SQLITE_CACHE_MB", "64"))
+    # Usa a tabela de somas mensais nos KPIs (0 = sempre somar as medições diárias;
+    # a tabela continua sendo mantida)
+    KPI_USE_ROLLUP: bool = os.getenv("KPI_USE_ROLLUP", "1") == "1"
+    # Motor de KPIs em memória (NumPy) e seu limite de memória; acima dele, usa SQL
+    KPI_ENGINE: bool = os.getenv("KPI_ENGINE", "0") == "1"
+    KPI_ENGINE_MAX_MB: int = int(os.getenv("KPI_ENGINE_MAX_MB", "256"))
+    # Resultados de /kpi/agregado guardados em memória (por processo)
+    KPI_AGG_CACHE_ITEMS: int = int(os.getenv("KPI_AGG_CACHE_ITEMS", "256"))
+    # Uploads: tamanho do bloco de cópia, linhas por bloco e limite para o modo streaming
+    UPLOAD_COPY_CHUNK_BYTES: int = int(os.getenv("UPLOAD_COPY_CHUNK_BYTES", str(1024 * 1024)))
+    INGEST_CHUNK_ROWS: int = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+    INGEST_STREAM_THRESHOLD_MB: int = int(os.getenv("INGEST_STREAM_THRESHOLD_MB", "10"))
+    # Cache de relatórios PDF/XLSX (LRU limitado por tamanho em disco)
+    REPORT_CACHE_DIR: str = os.getenv("REPORT_CACHE_DIR", "out/cache")
+    REPORT_CACHE_MAX_MB: int = int(os.getenv("REPORT_CACHE_MAX_MB", "200"))
+    # Processos para renderizar relatórios em lote (0 = nº de CPUs)
+    REPORT_WORKERS: int = int(os.getenv("REPORT_WORKERS", "0"))
+    # Também grava uma cópia dos relatórios servidos em out/ (opcional)
+    REPORT_SAVE_COPY: bool = os.getenv("REPORT_SAVE_COPY", "0") == "1"
+    # Jobs em segundo plano: threads por processo, limite da fila, arquivos,
+    # retenção dos concluídos e tempo sem heartbeat para reexecutar um job "executando"
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "2"))
+    JOBS_MAX_PENDING: int = int(os.getenv("JOBS_MAX_PENDING", "100"))
+    JOBS_DIR: str = os.getenv("JOBS_DIR", "out/jobs")
+    JOBS_TTL_H: int = int(os.getenv("JOBS_TTL_H", "72"))
+    JOBS_STALE_S: int = int(os.getenv("JOBS_STALE_S", "600"))
+    # Profiling sob demanda (X-Profile: 1 ou ?profile=1); guarda os últimos PROFILE_KEEP
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "0") == "1"
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "out/profiles")
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", "20"))
 
 settings = Settings()
@@ -0,0 +1,226 @@
+"""
+Métricas em memória do processo, expostas em /metrics no formato texto do Prometheus.
+
+- latência por rota (histograma) e, por requisição, nº de comandos SQL e tempo no
+  banco, contados pelos hooks before/after_cursor_execute de cada engine;
+- tempo de renderização de relatórios e linhas/s da ingestão.
+
+Cada processo (ex.: worker do uvicorn) tem seus próprios contadores.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(nomes: tuple, valores: tuple) -> str:
+    if not nomes:
+        return ""
+    pares = ",".join(
+        f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for n, v in zip(nomes, valores)
+    )
+    return "{" + pares + "}"
+
+
+class _Metric:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, labels: tuple = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._valores: dict[tuple, object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labels)
+
+    def render(self) -> list[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        with self._lock:
+            itens = sorted(self._valores.items())
+        for key, valor in itens:
+            linhas.extend(self._render_item(key, valor))
+        return linhas
+
+    def _render_item(self, key, valor) -> list[str]:
+        return [f"{self.nome}{_labels(self.labels, key)} {round(valor, 6)}"]
+
+
+class Counter(_Metric):
+    tipo = "counter"
+
+    def inc(self, valor: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._valores[key] = self._valores.get(key, 0) + valor
+
+
+class Gauge(_Metric):
+    tipo = "gauge"
+
+    def set(self, valor: float, **labels):
+        with self._lock:
+            self._valores[self._key(labels)] = valor
+
+
+class Histogram(_Metric):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(nome, ajuda, labels)
+        self.buckets = buckets
+
+    def observe(self, valor: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # (contagens acumuladas por bucket, soma, total)
+            contagens, soma, total = self._valores.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    contagens[i] += 1
+            self._valores[key] = (contagens, soma + valor, total + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, **labels)
+
+    def _render_item(self, key, valor) -> list[str]:
+        contagens, soma, total = valor
+        nomes = (*self.labels, "le")
+        linhas = [
+            f"{self.nome}_bucket{_labels(nomes, (*key, limite))} {n}"
+            for limite, n in zip(self.buckets, contagens)
+        ]
+        linhas.append(f"{self.nome}_bucket{_labels(nomes, (*key, '+Inf'))} {total}")
+        linhas.append(f"{self.nome}_sum{_labels(self.labels, key)} {round(soma, 6)}")
+        linhas.append(f"{self.nome}_count{_labels(self.labels, key)} {total}")
+        return linhas
+
+
+REGISTRY: list[_Metric] = []
+
+HTTP_LATENCY = Histogram(
+    "agrovet_http_request_duration_seconds", "Latência das requisições por rota.", ("method", "rota", "status")
+)
+DB_STATEMENTS = Counter("agrovet_db_statements_total", "Comandos SQL executados, por rota.", ("rota",))
+DB_SECONDS = Counter("agrovet_db_seconds_total", "Tempo gasto no banco, por rota.", ("rota",))
+REPORT_RENDER = Histogram(
+    "agrovet_report_render_seconds", "Tempo de renderização de relatórios.", ("formato",)
+)
+INGEST_ROWS = Counter("agrovet_ingest_rows_total", "Medições gravadas pela ingestão.")
+INGEST_SECONDS = Counter("agrovet_ingest_seconds_total", "Tempo gasto gravando medições.")
+INGEST_ROWS_PER_SECOND = Gauge("agrovet_ingest_rows_per_second", "Linhas/s do último lote gravado.")
+JOBS_PENDING = Gauge("agrovet_jobs_pending", "Jobs na fila ou em execução neste processo.")
+JOBS_FINISHED = Counter("agrovet_jobs_finished_total", "Jobs encerrados, por tipo e status.", ("tipo", "status"))
+JOBS_SECONDS = Histogram("agrovet_job_duration_seconds", "Duração dos jobs.", ("tipo",),
+                         buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0))
+
+
+def render_prometheus() -> str:
+    return "\n".join(linha for m in REGISTRY for linha in m.render()) + "\n"
+
+
+def record_ingest(linhas: int, segundos: float):
+    INGEST_ROWS.inc(linhas)
+    INGEST_SECONDS.inc(segundos)
+    if segundos > 0:
+        INGEST_ROWS_PER_SECOND.set(round(linhas / segundos, 1))
+
+
+# ==========================================================
+# SQL por requisição
+# ==========================================================
+class QueryStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Objeto mutável: as tarefas/threads/greenlets da requisição herdam o contexto
+# e somam no mesmo acumulador
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def start_query_stats() -> QueryStats:
+    stats = QueryStats()
+    _query_stats.set(stats)
+    return stats
+
+
+# O início fica no contexto de execução do comando, não na conexão: se o comando
+# falhar, o after_cursor_execute não roda e nada sobra para o próximo comando
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_inicio = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_metrics_inicio", None)
+    stats = _query_stats.get()
+    if stats is not None and inicio is not None:
+        stats.statements += 1
+        stats.seconds += time.perf_counter() - inicio
+
+
+def instrument_engine(engine):
+    """Registra os hooks de contagem de SQL num engine síncrono (ou `async_engine.sync_engine`)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ==========================================================
+# Middleware ASGI
+# ==========================================================
+class MetricsMiddleware:
+    """
+    Mede cada requisição HTTP até o fim do corpo da resposta e adiciona
+    `Server-Timing` (tempo e nº de comandos no banco, tempo total até os cabeçalhos).
+    Rotas são identificadas pelo template (ex.: /kpi/{fazenda_id}) para não explodir
+    a cardinalidade.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        stats = start_query_stats()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - inicio) * 1000
+                timing = (
+                    f'db;desc="{stats.statements} queries";dur={stats.seconds * 1000:.1f}, '
+                    f"app;dur={total_ms:.1f}"
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            rota = getattr(route, "path", None) or "desconhecida"
+            HTTP_LATENCY.observe(time.perf_counter() - inicio, method=scope["method"], rota=rota, status=status)
+            DB_STATEMENTS.inc(stats.statements, rota=rota)
+            DB_SECONDS.inc(stats.seconds, rota=rota)
@@ -0,0 +1,175 @@
+"""
+Profiling opcional por requisição (cProfile).
+
+Com PROFILING_ENABLED=1, uma requisição com o cabeçalho `X-Profile: 1` ou o
+parâmetro `?profile=1` roda sob o cProfile. O resultado (formato pstats) é salvo
+em PROFILE_DIR, que guarda só os PROFILE_KEEP mais recentes, e o id volta no
+cabeçalho `X-Profile-Id` (download em /profiles/{id}).
+
+O profiler do middleware cobre a thread do event loop, incluindo os serviços
+chamados por `AsyncSession.run_sync`. Funções marcadas com `@hot_path` que rodam
+no threadpool (ex.: leitura de planilhas) ganham um profiler próprio, somado ao
+da requisição no final; trabalho do pool de processos roda no próprio processo
+enquanto houver profiling ativo (ver `app.services.report_batch.run_in_render_pool`).
+"""
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+from app.core.logging import logger
+
+PROFILE_EXT = ".prof"
+
+
+class ProfileSession:
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.thread_id = threading.get_ident()
+        self.main = cProfile.Profile()
+        self.extras: list[cProfile.Profile] = []
+        self._ativos: set[int] = set()  # threads com profiler ligado
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, **kwargs):
+        """Executa `fn` com um profiler próprio se a thread ainda não tiver um."""
+        tid = threading.get_ident()
+        with self._lock:
+            if tid == self.thread_id or tid in self._ativos:
+                prof = None
+            else:
+                self._ativos.add(tid)
+                prof = cProfile.Profile()
+        if prof is None:
+            return fn(*args, **kwargs)
+        try:
+            prof.enable()
+        except ValueError:
+            # Python 3.12+: um único profiler por processo, que já cobre esta thread
+            with self._lock:
+                self._ativos.discard(tid)
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+            with self._lock:
+                self._ativos.discard(tid)
+                self.extras.append(prof)
+
+    def save(self) -> str:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        stats = pstats.Stats(self.main)
+        with self._lock:
+            for prof in self.extras:
+                stats.add(prof)
+        path = profile_path(self.id)
+        stats.dump_stats(path)
+        _evict()
+        return path
+
+
+_active: ContextVar[ProfileSession | None] = ContextVar("profile_session", default=None)
+_busy = threading.Lock()  # uma requisição perfilada por vez
+
+
+def active() -> ProfileSession | None:
+    return _active.get()
+
+
+def call_profiled(fn, *args, **kwargs):
+    """Chama `fn` dentro do profiling da requisição atual (se houver)."""
+    sess = _active.get()
+    if sess is None:
+        return fn(*args, **kwargs)
+    return sess.call(fn, *args, **kwargs)
+
+
+def hot_path(fn):
+    """Marca uma função para entrar no profile mesmo quando roda fora do event loop."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return call_profiled(fn, *args, **kwargs)
+    return wrapper
+
+
+def profile_path(profile_id: str) -> str:
+    if not profile_id.isalnum():
+        raise ValueError("Id de profile inválido")
+    return os.path.join(settings.PROFILE_DIR, f"{profile_id}{PROFILE_EXT}")
+
+
+def _evict():
+    arquivos = []
+    for nome in os.listdir(settings.PROFILE_DIR):
+        if nome.endswith(PROFILE_EXT):
+            path = os.path.join(settings.PROFILE_DIR, nome)
+            arquivos.append((os.path.getmtime(path), path))
+    arquivos.sort()
+    for _, path in arquivos[:max(0, len(arquivos) - settings.PROFILE_KEEP)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def profile_text(profile_id: str, limite: int = 40) -> str:
+    """Resumo legível (funções ordenadas por tempo acumulado)."""
+    import io
+
+    out = io.StringIO()
+    pstats.Stats(profile_path(profile_id), stream=out).sort_stats("cumulative").print_stats(limite)
+    return out.getvalue()
+
+
+def _requested(scope) -> bool:
+    for nome, valor in scope.get("headers", []):
+        if nome == b"x-profile":
+            return valor.strip() in (b"1", b"true")
+    flag = parse_qs(scope.get("query_string", b"").decode()).get("profile")
+    return bool(flag) and flag[-1] in ("1", "true")
+
+
+class ProfilingMiddleware:
+    """Liga o cProfile nas requisições que pedirem (ver docstring do módulo)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.PROFILING_ENABLED or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not _busy.acquire(blocking=False):
+            # Outro profile em andamento: o cProfile mediria as duas requisições misturadas
+            await self.app(scope, receive, _with_header(send, b"x-profile-id", b"ocupado"))
+            return
+
+        sess = ProfileSession()
+        token = _active.set(sess)
+        inicio = time.perf_counter()
+        try:
+            sess.main.enable()
+            try:
+                await self.app(scope, receive, _with_header(send, b"x-profile-id", sess.id.encode()))
+            finally:
+                sess.main.disable()
+            sess.save()
+            logger.info(f"Profile {sess.id}: {scope['path']} em {time.perf_counter() - inicio:.3f}s")
+        finally:
+            _active.reset(token)
+            _busy.release()
+
+
+def _with_header(send, nome: bytes, valor: bytes):
+    async def wrapper(message):
+        if message["type"] == "http.response.start":
+            message["headers"] = [*message.get("headers", []), (nome, valor)]
+        await send(message)
+    return wrapper
@@ -1,6 +1,8 @@
 # app/dashboards/app_streamlit.py
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import date
 import urllib.parse
 
@@ -10,23 +12,78 @@ st.set_page_config(page_title="Métricas AgroVet", page_icon="🐄", layout="wid
 # 🔹 Configurações
 # ==========================================
 API_URL = st.secrets.get("API_URL", "http://localhost:8000")
+# (conexão, leitura) em segundos; relatórios podem demorar mais para gerar
+TIMEOUT = (5, 15)
+REPORT_TIMEOUT = (5, 120)
+REPORT_CACHE_ITEMS = 10  # relatórios guardados por sessão
+FARM_PAGE_SIZE = 200  # fazendas no seletor; use a busca para as demais
+
+# ==========================================
+# 🔹 Conexão com a API
+# ==========================================
+@st.cache_resource
+def get_session():
+    """
+    Sessão HTTP única para todo o app: reaproveita a conexão (keep-alive)
+    entre reruns e repete GETs que falham por instabilidade da rede.
+    """
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=30, show_spinner=False)
+def check_api():
+    # Falha levanta exceção (não cacheada): a API volta a ser testada na próxima execução
+    r = get_session().get(f"{API_URL}/", timeout=TIMEOUT)
+    r.raise_for_status()
+    return True
+
+@st.cache_data(ttl=300, show_spinner=False)
+def listar_fazendas(busca: str = ""):
+    # Primeira página da busca por prefixo; erros não são cacheados
+    params = {"limit": FARM_PAGE_SIZE}
+    if busca:
+        params["busca"] = busca
+    r = get_session().get(f"{API_URL}/fazendas/", params=params, timeout=TIMEOUT)
+    r.raise_for_status()
+    return r.json()["itens"]
+
+def baixar_relatorio(fazenda_id: int, inicio: date, fim: date, fmt: str) -> bytes:
+    """
+    Bytes do relatório (pdf/xlsx), guardados na sessão por fazenda e período.
+    A cópia guardada é revalidada com If-None-Match: se a API responder 304,
+    nada é baixado de novo.
+    """
+    cache = st.session_state.setdefault("relatorios", {})
+    chave = (fazenda_id, str(inicio), str(fim), fmt)
+    etag, conteudo = cache.pop(chave, (None, None))
+    headers = {"If-None-Match": etag} if etag else {}
+    r = get_session().get(f"{API_URL}/relatorio/fazenda/{fazenda_id}.{fmt}",
+                          params={"inicio": inicio, "fim": fim}, headers=headers, timeout=REPORT_TIMEOUT)
+    if r.status_code != 304 or conteudo is None:
+        r.raise_for_status()
+        etag, conteudo = r.headers.get("ETag"), r.content
+    cache[chave] = (etag, conteudo)  # reinsere no fim: mais recente
+    while len(cache) > REPORT_CACHE_ITEMS:
+        cache.pop(next(iter(cache)))
+    return conteudo
 
 st.sidebar.title("Métricas AgroVet")
 opcao = st.sidebar.radio("Navegação", ["Secretário(a) 📋", "Resultados 📊", "Ajuda ❄️"])
+if st.sidebar.button("🔄 Atualizar dados"):
+    check_api.clear()
+    listar_fazendas.clear()
 
 # ==========================================
 # 🔹 Verifica status da API
 # ==========================================
-def check_api():
-    try:
-        r = requests.get(f"{API_URL}/")
-        if r.status_code == 200:
-            return True
-    except Exception:
-        pass
-    return False
-
-api_ok = check_api()
+try:
+    api_ok = check_api()
+except Exception:
+    api_ok = False
 
 # ==========================================
 # 🔹 Página — Secretário(a)
@@ -39,19 +96,15 @@ if opcao == "Secretário(a) 📋":
         st.warning("⚠️ API offline. Inicie o backend antes de registrar dados.")
     else:
         # Busca lista de fazendas
+        busca = st.text_input("Buscar fazenda", key=f"busca_{opcao}").strip()
         try:
-            response = requests.get(f"{API_URL}/fazendas/")
-            if response.status_code == 200:
-                fazendas = response.json()
-                if fazendas:
-                    nomes = [f["nome"] for f in fazendas]
-                    selecionada = st.selectbox("Selecione a Fazenda", nomes)
-                    id_fazenda = next(f["id"] for f in fazendas if f["nome"] == selecionada)
-                else:
-                    st.warning("Nenhuma fazenda cadastrada.")
-                    id_fazenda = None
+            fazendas = listar_fazendas(busca)
+            if fazendas:
+                nomes = [f["nome"] for f in fazendas]
+                selecionada = st.selectbox("Selecione a Fazenda", nomes)
+                id_fazenda = next(f["id"] for f in fazendas if f["nome"] == selecionada)
             else:
-                st.warning("⚠️ Falha ao carregar fazendas.")
+                st.warning("Nenhuma fazenda encontrada." if busca else "Nenhuma fazenda cadastrada.")
                 id_fazenda = None
         except Exception as e:
             st.warning(f"⚠️ Erro ao buscar fazendas: {e}")
@@ -76,19 +129,15 @@ elif opcao == "Resultados 📊":
     if not api_ok:
         st.warning("⚠️ API offline. Inicie o backend antes de gerar relatórios.")
     else:
+        busca = st.text_input("Buscar fazenda", key=f"busca_{opcao}").strip()
         try:
-            response = requests.get(f"{API_URL}/fazendas/")
-            if response.status_code == 200:
-                fazendas = response.json()
-                if fazendas:
-                    nomes = [f["nome"] for f in fazendas]
-                    selecionada = st.selectbox("Selecione a Fazenda", nomes)
-                    id_fazenda = next(f["id"] for f in fazendas if f["nome"] == selecionada)
-                else:
-                    st.warning("Nenhuma fazenda cadastrada.")
-                    id_fazenda = None
+            fazendas = listar_fazendas(busca)
+            if fazendas:
+                nomes = [f["nome"] for f in fazendas]
+                selecionada = st.selectbox("Selecione a Fazenda", nomes)
+                id_fazenda = next(f["id"] for f in fazendas if f["nome"] == selecionada)
             else:
-                st.warning("⚠️ Erro ao carregar fazendas.")
+                st.warning("Nenhuma fazenda encontrada." if busca else "Nenhuma fazenda cadastrada.")
                 id_fazenda = None
         except Exception as e:
             st.warning(f"⚠️ Erro ao conectar à API: {e}")
@@ -108,11 +157,10 @@ elif opcao == "Resultados 📊":
             with col1:
                 if st.button("📊 Gerar XLSX"):
                     try:
-                        r = requests.get(f"{API_URL}/relatorio/fazenda/{id_fazenda}.xlsx",
-                                         params={"inicio": inicio, "fim": fim})
-                        if r.status_code == 200:
+                        conteudo = baixar_relatorio(id_fazenda, inicio, fim, "xlsx")
+                        if conteudo:
                             st.download_button("⬇️ Baixar XLSX",
-                                               r.content,
+                                               conteudo,
                                                file_name=f"Relatorio_{selecionada}.xlsx")
                             # Gera link de envio
                             mensagem = (
@@ -134,11 +182,10 @@ elif opcao == "Resultados 📊":
             with col2:
                 if st.button("🧾 Gerar PDF"):
                     try:
-                        r = requests.get(f"{API_URL}/relatorio/fazenda/{id_fazenda}.pdf",
-                                         params={"inicio": inicio, "fim": fim})
-                        if r.status_code == 200:
+                        conteudo = baixar_relatorio(id_fazenda, inicio, fim, "pdf")
+                        if conteudo:
                             st.download_button("⬇️ Baixar PDF",
-                                               r.content,
+                                               conteudo,
                                                file_name=f"Relatorio_{selecionada}.pdf")
                             # Gera link de envio
                             mensagem = (
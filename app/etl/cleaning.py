@@ -1,21 +1,22 @@
 import pandas as pd
 from datetime import datetime
+from itertools import islice
+from pydantic import ValidationError
+from app.core.profiling import hot_path
 from app.schemas.ingest import MobileInput
 
 EXPECTED_COLS = ["fazenda", "data", "aptas", "inseminadas", "gestantes", "partos"]
+NUMERIC_COLS = ["aptas", "inseminadas", "gestantes", "partos"]
+HEADER_ROWS = 1  # a linha 1 da planilha é o cabeçalho
 
-def normalize_excel(file_path: str):
-    """
-    Lê um arquivo Excel/CSV e converte em MobileInput.
-    Corrige nomes de colunas e valida conteúdo.
-    """
+def _read_frame(file_path: str) -> pd.DataFrame:
     ext = file_path.split(".")[-1].lower()
     if ext == "csv":
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
+        return pd.read_csv(file_path)
+    return pd.read_excel(file_path)
 
-    df.columns = [c.strip().lower() for c in df.columns]
+def _map_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip().lower() for c in df.columns]
 
     # Tenta mapear colunas equivalentes
     col_map = {}
@@ -33,26 +34,189 @@ def normalize_excel(file_path: str):
         elif "part" in c:
             col_map[c] = "partos"
 
-    df = df.rename(columns=col_map)
+    return df.rename(columns=col_map)
+
+def _row_error(row: pd.Series, motivo: str) -> str:
+    # Só para linhas inválidas: usa o MobileInput para detalhar o erro de validação
+    try:
+        campos = dict(
+            fazenda=str(row.get("fazenda", "")).strip(),
+            data=pd.to_datetime(row.get("data")).date() if not pd.isna(row.get("data")) else datetime.today().date(),
+            **{c: int(row.get(c, 0)) for c in NUMERIC_COLS},
+        )
+    except (TypeError, ValueError, OverflowError):
+        # Célula vazia/NaN ou não numérica: o motivo calculado já diz qual coluna
+        return motivo
+    try:
+        MobileInput(**campos)
+    except ValidationError as e:
+        return "; ".join(err["msg"] for err in e.errors())
+    except Exception as e:
+        return str(e)
+    return motivo
+
+@hot_path
+def normalize_frame(df: pd.DataFrame, first_row: int = HEADER_ROWS + 1, check_columns: bool = True):
+    """
+    Valida um DataFrame já lido, operando sobre colunas inteiras.
+    Retorna (lote, warnings): `lote` é um DataFrame com as colunas
+    fazenda, data, aptas, inseminadas, gestantes, partos e `linha`
+    (número da linha na planilha), pronto para `bulk_insert_frame`.
+    """
+    df = _map_columns(df).reset_index(drop=True)
 
     warnings = []
     missing = [c for c in EXPECTED_COLS if c not in df.columns]
-    if missing:
+    if missing and check_columns:
         warnings.append(f"Colunas ausentes: {', '.join(missing)}")
 
-    clean_rows = []
-    for _, row in df.iterrows():
-        try:
-            item = MobileInput(
-                fazenda=str(row.get("fazenda", "")).strip(),
-                data=pd.to_datetime(row.get("data")).date() if not pd.isna(row.get("data")) else datetime.today().date(),
-                aptas=int(row.get("aptas", 0)),
-                inseminadas=int(row.get("inseminadas", 0)),
-                gestantes=int(row.get("gestantes", 0)),
-                partos=int(row.get("partos", 0)),
-            )
-            clean_rows.append(item)
-        except Exception as e:
-            warnings.append(f"Linha ignorada: {e}")
+    n = len(df)
+    lote = pd.DataFrame({"linha": pd.RangeIndex(first_row, first_row + n)})
+    motivo = pd.Series("", index=df.index, dtype=object)
+
+    # Fazenda
+    if "fazenda" in df.columns:
+        lote["fazenda"] = df["fazenda"].where(df["fazenda"].notna(), "").astype(str).str.strip()
+    else:
+        lote["fazenda"] = ""
+    motivo = motivo.mask((motivo == "") & (lote["fazenda"] == ""), "fazenda não informada")
+
+    # Data: vazia = hoje; texto que não é data invalida a linha
+    hoje = pd.Timestamp(datetime.today().date())
+    if "data" in df.columns:
+        bruto = df["data"]
+        datas = pd.to_datetime(bruto, errors="coerce")
+        falhas = datas.isna() & bruto.notna()
+        if falhas.any():
+            # Formatos diferentes do inferido na coluna: nova tentativa só nessas células
+            datas[falhas] = pd.to_datetime(bruto[falhas], errors="coerce", format="mixed")
+            falhas = datas.isna() & bruto.notna()
+        motivo = motivo.mask((motivo == "") & falhas, "data inválida")
+        datas = datas.fillna(hoje)
+    else:
+        datas = pd.Series(hoje, index=df.index)
+    lote["data"] = datas.dt.date
+
+    # Contagens: inteiras e não negativas
+    for col in NUMERIC_COLS:
+        if col in df.columns:
+            valores = pd.to_numeric(df[col], errors="coerce")
+        else:
+            valores = pd.Series(0, index=df.index)
+        motivo = motivo.mask((motivo == "") & valores.isna(), f"{col} inválido")
+        motivo = motivo.mask((motivo == "") & (valores < 0), "valores não podem ser negativos")
+        lote[col] = valores.fillna(0).astype("int64")
+
+    # Regras de coerência
+    motivo = motivo.mask((motivo == "") & (lote["inseminadas"] > lote["aptas"]),
+                         "inseminadas não pode ser maior que aptas")
+    motivo = motivo.mask((motivo == "") & (lote["gestantes"] > lote["inseminadas"]),
+                         "gestantes não pode ser maior que inseminadas")
+
+    invalidas = motivo != ""
+    for idx in invalidas[invalidas].index:
+        warnings.append(f"Linha {lote.at[idx, 'linha']} ignorada: {_row_error(df.loc[idx], motivo[idx])}")
+
+    return lote[~invalidas].reset_index(drop=True), warnings
+
+@hot_path
+def normalize_excel_batch(file_path: str):
+    """
+    Lê um arquivo Excel/CSV e devolve o lote colunar validado
+    (ver `normalize_frame`) e a lista de avisos.
+    """
+    return normalize_frame(_read_frame(file_path))
+
+def _iter_frames(file_path: str, chunk_rows: int):
+    """
+    Lê o arquivo em blocos de `chunk_rows` linhas sem carregá-lo inteiro:
+    CSV com `chunksize` e XLSX com o modo read-only do openpyxl.
+    """
+    ext = file_path.split(".")[-1].lower()
+    if ext == "csv":
+        yield from pd.read_csv(file_path, chunksize=chunk_rows)
+        return
+    if ext not in ("xlsx", "xlsm"):
+        # Formatos sem leitura incremental (ex.: .xls) são lidos de uma vez
+        yield pd.read_excel(file_path)
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = _drop_trailing_blank(wb.active.iter_rows(values_only=True))
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [c if c is not None else f"col{i}" for i, c in enumerate(header)]
+        while True:
+            bloco = list(islice(rows, chunk_rows))
+            if not bloco:
+                break
+            yield pd.DataFrame(bloco, columns=header)
+    finally:
+        wb.close()
+
+def _drop_trailing_blank(rows):
+    """
+    Descarta as linhas vazias (só None) do fim da planilha, como o `pd.read_excel`:
+    células formatadas sem valor aparecem no modo read-only. Vazias no meio dos
+    dados são mantidas, e a numeração das linhas não muda.
+    """
+    vazias, vazia = 0, None
+    for row in rows:
+        if all(c is None for c in row):
+            vazias, vazia = vazias + 1, row
+            continue
+        for _ in range(vazias):
+            yield vazia
+        vazias = 0
+        yield row
 
+def estimate_rows(file_path: str) -> int | None:
+    """
+    Nº de linhas de dados do arquivo sem interpretá-lo (para barras de progresso):
+    quebras de linha do CSV ou a dimensão declarada da planilha XLSX.
+    """
+    ext = file_path.split(".")[-1].lower()
+    if ext == "csv":
+        with open(file_path, "rb") as f:
+            n = sum(bloco.count(b"\n") for bloco in iter(lambda: f.read(1024 * 1024), b""))
+        return max(n - HEADER_ROWS, 0)
+    if ext not in ("xlsx", "xlsm"):
+        return None
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        max_row = wb.active.max_row
+    finally:
+        wb.close()
+    return max(max_row - HEADER_ROWS, 0) if max_row else None
+
+def iter_normalized_chunks(file_path: str, chunk_rows: int, ao_ler=None):
+    """
+    Versão em streaming de `normalize_excel_batch`: gera (lote, warnings)
+    para cada bloco de até `chunk_rows` linhas, com a numeração da planilha.
+    `ao_ler`, se informado, recebe o total de linhas lidas (válidas ou não) a cada bloco.
+    """
+    first_row = HEADER_ROWS + 1
+    for i, df in enumerate(_iter_frames(file_path, chunk_rows)):
+        first_row += len(df)
+        if ao_ler is not None:
+            ao_ler(first_row - HEADER_ROWS - 1)
+        yield normalize_frame(df, first_row=first_row - len(df), check_columns=(i == 0))
+
+@hot_path
+def normalize_excel(file_path: str):
+    """
+    Lê um arquivo Excel/CSV e converte em MobileInput.
+    Corrige nomes de colunas e valida conteúdo.
+    """
+    lote, warnings = normalize_excel_batch(file_path)
+    clean_rows = [
+        MobileInput(**rec) for rec in lote.drop(columns="linha").to_dict("records")
+    ]
     return clean_rows, warnings
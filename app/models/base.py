@@ -1,12 +1,48 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+
+IS_SQLITE = settings.DATABASE_URL.startswith("sqlite")
 
 connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
+if IS_SQLITE:
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, future=True)
+def pool_options() -> dict:
+    """Opções de pool vindas de `settings` (ver DB_POOL_*)."""
+    opts = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    if not IS_SQLITE:
+        # No SQLite o SQLAlchemy escolhe o pool conforme o arquivo/driver
+        opts.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+    return opts
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Modo WAL: leitores não bloqueiam o escritor e vice-versa. Com
+    synchronous=NORMAL o commit não espera fsync a cada transação, e o
+    busy_timeout faz escritas concorrentes esperarem em vez de falhar
+    com "database is locked".
+    """
+    cur = dbapi_connection.cursor()
+    try:
+        if settings.SQLITE_WAL:
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+        if settings.SQLITE_BUSY_TIMEOUT_MS:
+            cur.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        if settings.SQLITE_MMAP_MB:
+            cur.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_MB) * 1024 * 1024}")
+        if settings.SQLITE_CACHE_MB:
+            cur.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_MB) * 1024}")  # negativo = KiB
+    finally:
+        cur.close()
+
+engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, future=True, **pool_options())
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 Base = declarative_base()
 
@@ -16,3 +52,41 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# ==========================================================
+# Camada assíncrona (rotas async): aiosqlite local, asyncpg em produção
+# ==========================================================
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+_async_engine = None
+_async_sessionmaker = None
+
+def async_database_url(url: str):
+    """Troca o driver de DATABASE_URL pelo equivalente assíncrono."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Banco sem driver assíncrono configurado: {backend}")
+    return u.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+def get_async_engine():
+    # Criado no primeiro uso: o driver assíncrono só é importado se for usado
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        _async_engine = create_async_engine(async_database_url(settings.DATABASE_URL), **pool_options())
+        if IS_SQLITE:
+            event.listen(_async_engine.sync_engine, "connect", _sqlite_pragmas)
+        instrument_engine(_async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_db():
+    """
+    Sessão assíncrona. Os serviços síncronos rodam nela com
+    `await db.run_sync(servico, ...)`, sem ocupar o threadpool.
+    """
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
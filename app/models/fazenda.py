@@ -1,6 +1,15 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Index, func
 from app.models.base import Base
 
+def nome_busca(coluna, dialect: str):
+    """
+    Chave da busca por prefixo do nome, sem diferenciar maiúsculas. No Postgres
+    usa a collation "C" (ordem por bytes), para que a faixa [prefixo, prefixo + U+10FFFF)
+    cubra exatamente os nomes que começam com o prefixo; o SQLite já compara em binário.
+    """
+    chave = func.lower(coluna)
+    return chave.collate("C") if dialect == "postgresql" else chave
+
 class Fazenda(Base):
     __tablename__ = "fazendas"
     id = Column(Integer, primary_key=True, index=True)
@@ -8,3 +17,8 @@ class Fazenda(Base):
     produtor = Column(String, nullable=True)
     municipio = Column(String, nullable=True)
     estado = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_fazendas_nome_lower", nome_busca(nome, "sqlite")).ddl_if(dialect="sqlite"),
+        Index("ix_fazendas_nome_lower_c", nome_busca(nome, "postgresql")).ddl_if(dialect="postgresql"),
+    )
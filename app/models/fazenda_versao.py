@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey
+from app.models.base import Base
+
+class FazendaVersao(Base):
+    """Versão dos dados de cada fazenda; a ingestão renova a cada gravação."""
+    __tablename__ = "fazenda_versoes"
+    fazenda_id = Column(Integer, ForeignKey("fazendas.id"), primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0, index=True)  # carimbo em microssegundos
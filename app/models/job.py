@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Float, DateTime, JSON
+from app.models.base import Base
+
+class Job(Base):
+    """Tarefa em segundo plano (importação ou relatório); ver app.services.jobs."""
+    __tablename__ = "jobs"
+    id = Column(String(32), primary_key=True)
+    tipo = Column(String, nullable=False)  # importacao|relatorio
+    status = Column(String, nullable=False, index=True)  # pendente|executando|concluido|erro
+    progresso = Column(Float, nullable=True)  # 0..1 (None = sem estimativa)
+    parametros = Column(JSON, nullable=False)
+    resultado = Column(JSON, nullable=True)
+    arquivo = Column(String, nullable=True)  # resultado para download
+    erro = Column(String, nullable=True)
+    criado_em = Column(DateTime, nullable=False)
+    atualizado_em = Column(DateTime, nullable=False)  # também serve de heartbeat
+    concluido_em = Column(DateTime, nullable=True)
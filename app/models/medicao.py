@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, CheckConstraint
+from app.models.base import Base
+
+MEDIDAS = ("aptas", "inseminadas", "gestantes", "partos")
+
+class Medicao(Base):
+    """
+    Uma medição reprodutiva por fazenda e dia. A chave primária (fazenda_id, data)
+    é o único índice: no SQLite a tabela é WITHOUT ROWID, então as linhas ficam
+    gravadas na ordem da chave e um período de uma fazenda é uma única faixa contígua.
+    """
+    __tablename__ = "medicoes"
+    fazenda_id = Column(Integer, ForeignKey("fazendas.id"), primary_key=True)
+    data = Column(Date, primary_key=True)
+    aptas = Column(Integer, nullable=False, default=0)
+    inseminadas = Column(Integer, nullable=False, default=0)
+    gestantes = Column(Integer, nullable=False, default=0)
+    partos = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        CheckConstraint("aptas >= 0 AND inseminadas >= 0 AND gestantes >= 0 AND partos >= 0",
+                        name="ck_medicao_nao_negativa"),
+        {"sqlite_with_rowid": False},
+    )
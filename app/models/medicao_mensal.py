@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from app.models.base import Base
+
+class MedicaoMensal(Base):
+    """Soma pré-calculada de `medicoes` por fazenda e mês."""
+    __tablename__ = "medicoes_mensal"
+    fazenda_id = Column(Integer, ForeignKey("fazendas.id"), primary_key=True)
+    mes = Column(Date, primary_key=True)  # primeiro dia do mês
+    aptas = Column(Integer, nullable=False, default=0)
+    inseminadas = Column(Integer, nullable=False, default=0)
+    gestantes = Column(Integer, nullable=False, default=0)
+    partos = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = ({"sqlite_with_rowid": False},)
@@ -0,0 +1,101 @@
+"""
+Criação/atualização do schema.
+
+Roda no startup da API (lifespan) quando AUTO_MIGRATE=1, ou explicitamente
+antes de subir a aplicação:
+
+    python -m app.models.migrate
+"""
+from sqlalchemy import MetaData, Table, inspect, insert, select, func, case, literal, union_all, text
+from sqlalchemy.orm import Session
+
+from app.models.base import Base, SessionLocal, engine
+from app.core.logging import logger
+
+# Registra todas as tabelas no metadata
+from app.models import fazenda, medicao, medicao_mensal, fazenda_versao, versao_dados, ciclo, job  # noqa: F401
+from app.models.medicao import Medicao, MEDIDAS
+
+# Layout antigo (uma linha por fazenda/dia/tipo); hoje é uma view sobre `medicoes`
+EVENTOS_LEGADO = "eventos_repro"
+LEGADO_MENSAL = "eventos_repro_mensal"
+
+
+def migrate():
+    """Cria as tabelas e índices que faltam e faz o backfill dos buckets mensais."""
+    from app.services.rollup import ensure_rollups
+
+    Base.metadata.create_all(bind=engine)
+    # Índices novos em tabelas que já existiam (create_all não altera tabelas)
+    existentes = _index_names()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existentes:
+                index.create(bind=engine)
+    _migrate_eventos()
+    _create_eventos_view()
+    with SessionLocal() as db:
+        ensure_rollups(db)
+
+
+def _index_names() -> set[str]:
+    # Direto do catálogo: a reflexão do SQLite ignora índices de expressão (ex.: lower(nome))
+    with engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            return set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars())
+        if conn.dialect.name == "postgresql":
+            return set(conn.exec_driver_sql(
+                "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()").scalars())
+        insp = inspect(conn)
+        return {i["name"] for t in insp.get_table_names() for i in insp.get_indexes(t)}
+
+
+def _migrate_eventos():
+    """
+    Converte a tabela antiga `eventos_repro` (uma linha por tipo) em `medicoes`
+    (uma linha por fazenda/dia) e remove as tabelas antigas, numa transação.
+    Repetições de (fazenda_id, data, tipo) ficam com a linha mais recente (maior id);
+    as fazendas convertidas ganham versão nova na mesma transação.
+    """
+    from app.services.data_version import bump_farm_versions
+
+    with engine.begin() as conn:
+        tabelas = inspect(conn).get_table_names()
+        if EVENTOS_LEGADO not in tabelas:
+            return
+        antigo = Table(EVENTOS_LEGADO, MetaData(), autoload_with=conn, resolve_fks=False)
+        recentes = select(func.max(antigo.c.id)).group_by(antigo.c.fazenda_id, antigo.c.data, antigo.c.tipo)
+        src = (
+            select(antigo.c.fazenda_id, antigo.c.data, *(
+                func.sum(case((antigo.c.tipo == t, antigo.c.valor), else_=0)) for t in MEDIDAS
+            ))
+            .where(antigo.c.id.in_(recentes))
+            .group_by(antigo.c.fazenda_id, antigo.c.data)
+        )
+        n = conn.execute(insert(Medicao).from_select(["fazenda_id", "data", *MEDIDAS], src)).rowcount
+        # A deduplicação pode mudar os totais: caches/ETags das versões antigas não valem mais
+        with Session(bind=conn) as db:
+            bump_farm_versions(db, db.execute(select(antigo.c.fazenda_id).distinct()).scalars())
+        antigo.drop(conn)
+        if LEGADO_MENSAL in tabelas:
+            Table(LEGADO_MENSAL, MetaData(), autoload_with=conn, resolve_fks=False).drop(conn)
+    logger.info(f"{EVENTOS_LEGADO} convertida em {n} linhas de {Medicao.__tablename__}")
+
+
+def _create_eventos_view():
+    """View `eventos_repro` (fazenda_id, data, tipo, valor) para quem ainda lê o layout antigo."""
+    insp = inspect(engine)
+    if EVENTOS_LEGADO in insp.get_view_names() or EVENTOS_LEGADO in insp.get_table_names():
+        return
+    partes = [
+        select(Medicao.fazenda_id, Medicao.data, literal(t).label("tipo"), getattr(Medicao, t).label("valor"))
+        for t in MEDIDAS
+    ]
+    corpo = union_all(*partes).compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE VIEW {EVENTOS_LEGADO} AS {corpo}"))
+
+
+if __name__ == "__main__":
+    migrate()
+    logger.info("Schema atualizado")
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, BigInteger
+from app.models.base import Base
+
+class VersaoDados(Base):
+    """
+    Contador de alterações do banco (uma única linha, id=1), incrementado na
+    transação de cada gravação. Por ser atualizado na própria linha, os valores
+    seguem a ordem dos commits, ao contrário dos carimbos de `fazenda_versoes`.
+    """
+    __tablename__ = "versao_dados"
+    id = Column(Integer, primary_key=True)
+    contador = Column(BigInteger, nullable=False)
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+class FazendaItem(BaseModel):
+    id: int
+    nome: str
+
+class FazendaPage(BaseModel):
+    itens: list[FazendaItem]
+    proximo: str | None = None  # cursor da próxima página (parâmetro `apos`)
@@ -21,6 +21,15 @@ class MobileInput(BaseModel):
             raise ValueError("valores não podem ser negativos")
         return v
 
+class IngestChunk(BaseModel):
+    bloco: int
+    rows: int
+    inseridas: int
+    avisos: int
+    inseridas_acumuladas: int
+
 class IngestReport(BaseModel):
     rows: int
     warnings: list[str]
+    inseridas: int | None = None  # medições efetivamente gravadas
+    chunks: list[IngestChunk] | None = None  # progresso por bloco (modo streaming)
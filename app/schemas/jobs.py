@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+
+class RelatorioJobRequest(BaseModel):
+    fazenda_id: int
+    inicio: date
+    fim: date
+    formato: str = "pdf"  # pdf|xlsx
+
+class JobStatus(BaseModel):
+    id: str
+    tipo: str
+    status: str  # pendente|executando|concluido|erro
+    progresso: float | None = None  # 0..1; None = sem estimativa
+    parametros: dict
+    resultado: dict | None = None  # relatório da importação / dados do arquivo gerado
+    erro: str | None = None
+    criado_em: datetime
+    atualizado_em: datetime
+    concluido_em: datetime | None = None
+    download: str | None = None  # URL do resultado quando concluído
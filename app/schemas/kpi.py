@@ -18,9 +18,85 @@ class BenchmarkItem(BaseModel):
     fazenda_id: int
     fazenda_nome: str
     valor: float
+    posicao: int | None = None
+    percentil: float | None = None
+
+class BenchmarkQuartis(BaseModel):
+    min: float
+    p25: float
+    p50: float
+    p75: float
+    max: float
+    media: float
 
 class BenchmarkResponse(BaseModel):
     metric: str
     inicio: date
     fim: date
     ranking: list[BenchmarkItem]
+    total: int = 0
+    limit: int | None = None
+    offset: int = 0
+    quartis: BenchmarkQuartis | None = None
+    fazenda: BenchmarkItem | None = None  # posição da fazenda consultada no grupo
+
+class CalendarioBucket(BaseModel):
+    inicio: date
+    fim: date
+    partos_previstos: int
+
+class CalendarioResponse(BaseModel):
+    fazenda_id: int
+    fazenda_nome: str
+    granularidade: str
+    inicio: date
+    fim: date
+    total: int
+    buckets: list[CalendarioBucket]
+
+class SerieBucket(BaseModel):
+    inicio: date
+    fim: date
+    totais: dict
+    kpis: KPIs
+
+class SerieResponse(BaseModel):
+    fazenda_id: int
+    fazenda_nome: str
+    granularidade: str
+    inicio: date
+    fim: date
+    serie: list[SerieBucket]
+
+class AgregadoGrupo(BaseModel):
+    grupo: str | None  # None = fazendas sem o campo preenchido
+    fazendas: int
+    totais: dict
+    kpis: KPIs
+
+class AgregadoResponse(BaseModel):
+    nivel: str
+    inicio: date
+    fim: date
+    filtros: dict
+    grupos: list[AgregadoGrupo]
+    versao: str
+
+class CicloKPI(BaseModel):
+    ciclo_id: int
+    fazenda_id: int
+    fazenda_nome: str
+    inicio: date
+    fim: date
+    totais: dict
+    kpis: KPIs
+    variacao: dict | None = None  # TS/TC/TP menos os do ciclo anterior da fazenda
+
+class CiclosFazendaResponse(BaseModel):
+    fazenda_id: int
+    fazenda_nome: str
+    ciclos: list[CicloKPI]
+
+class CiclosResponse(BaseModel):
+    ciclos: list[CicloKPI]
+    total: int
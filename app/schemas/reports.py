@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from datetime import date
+
+class ReportBatchRequest(BaseModel):
+    inicio: date
+    fim: date
+    fazenda_ids: list[int] | None = None
+    produtor: str | None = None
+    municipio: str | None = None
+    estado: str | None = None
+    formato: str = "pdf"  # pdf|xlsx
+    combinado: bool = False  # PDF único com uma página por fazenda
@@ -0,0 +1,65 @@
+"""
+Versão dos dados por fazenda. Toda gravação de medições renova a versão
+da fazenda na mesma transação; caches (ex.: relatórios) usam a versão na chave.
+
+A versão é um carimbo de tempo (µs), não um contador: assim ela não se repete
+mesmo se o banco for recriado, e um cache antigo nunca casa com dados novos.
+O carimbo é tirado antes do commit, então o maior carimbo não acompanha a ordem
+dos commits; a versão do conjunto (`get_data_version`) usa o contador de
+`versao_dados`, incrementado na mesma transação (e iniciado com um carimbo).
+"""
+import time
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.fazenda import Fazenda
+from app.models.fazenda_versao import FazendaVersao
+from app.models.versao_dados import VersaoDados
+
+
+def bump_farm_versions(db: Session, fazenda_ids):
+    """Renova a versão das fazendas. Não faz commit."""
+    agora = time.time_ns() // 1000
+    rows = [{"fazenda_id": f, "versao": agora} for f in set(fazenda_ids)]
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        ins = (sqlite_insert if dialect == "sqlite" else pg_insert)(FazendaVersao.__table__)
+        db.execute(ins.on_conflict_do_update(
+            index_elements=["fazenda_id"],
+            set_={"versao": ins.excluded.versao},
+        ), rows)
+        cont = (sqlite_insert if dialect == "sqlite" else pg_insert)(VersaoDados.__table__)
+        db.execute(cont.values(id=1, contador=agora).on_conflict_do_update(
+            index_elements=["id"],
+            set_={"contador": VersaoDados.__table__.c.contador + 1},
+        ))
+        return
+    for r in rows:
+        v = db.get(FazendaVersao, r["fazenda_id"])
+        if v:
+            v.versao = agora
+        else:
+            db.add(FazendaVersao(**r))
+    cont = db.get(VersaoDados, 1, with_for_update=True)
+    if cont:
+        cont.contador += 1
+    else:
+        db.add(VersaoDados(id=1, contador=agora))
+
+def get_farm_version(db: Session, fazenda_id: int) -> int:
+    stmt = select(FazendaVersao.versao).where(FazendaVersao.fazenda_id == fazenda_id)
+    return int(db.execute(stmt).scalar() or 0)
+
+def get_data_version(db: Session) -> str:
+    """
+    Versão do conjunto de fazendas: muda a cada commit que grava medições
+    (contador de `versao_dados`) ou quando uma fazenda é criada (maior id).
+    """
+    contador, fazenda = db.execute(select(
+        select(VersaoDados.contador).where(VersaoDados.id == 1).scalar_subquery(),
+        select(func.max(Fazenda.id)).scalar_subquery(),
+    )).one()
+    return f"{contador or 0}-{fazenda or 0}"
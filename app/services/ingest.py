@@ -0,0 +1,163 @@
+"""
+Ingestão em lote de medições (mobile e planilhas).
+
+Resolve todos os nomes de fazenda de uma vez (com cache nome→id em memória),
+cria as fazendas que faltam num único INSERT e grava as medições em blocos com
+um upsert por bloco (ver `app.services.medicoes`), cada bloco na sua própria transação.
+"""
+import time
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.fazenda import Fazenda
+from app.schemas.ingest import MobileInput
+from app.services.kpi import TIPOS
+from app.services.medicoes import upsert_medicoes
+from app.core.logging import logger
+from app.core.metrics import record_ingest
+
+CHUNK_SIZE = 2000  # medições por transação
+_IN_CHUNK = 500  # nomes por cláusula IN
+
+# Cache nome→id por banco (URL do engine)
+_farm_ids: dict[str, dict[str, int]] = {}
+
+
+def _farm_cache(db: Session) -> dict[str, int]:
+    return _farm_ids.setdefault(str(db.get_bind().url), {})
+
+def resolve_farm_ids(db: Session, fazendas: dict[str, dict]) -> dict[str, int]:
+    """
+    Devolve o id de cada nome de fazenda em `fazendas` (nome → produtor/município/estado),
+    criando num único INSERT as que ainda não existem.
+    """
+    cache = _farm_cache(db)
+    faltando = [n for n in fazendas if n not in cache]
+
+    def _load(names):
+        for i in range(0, len(names), _IN_CHUNK):
+            stmt = select(Fazenda.nome, Fazenda.id).where(Fazenda.nome.in_(names[i:i + _IN_CHUNK]))
+            cache.update({nome: fid for nome, fid in db.execute(stmt)})
+
+    _load(faltando)
+    novas = [{"nome": n, **fazendas[n]} for n in faltando if n not in cache]
+    if novas:
+        dialect = db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            # Ignora nomes criados por outra requisição em paralelo
+            ins = (sqlite_insert if dialect == "sqlite" else pg_insert)(Fazenda.__table__)
+            db.execute(ins.on_conflict_do_nothing(index_elements=["nome"]), novas)
+        else:
+            db.execute(insert(Fazenda.__table__), novas)
+        db.commit()
+        _load([f["nome"] for f in novas])
+        logger.info(f"Criadas {len(novas)} fazendas")
+
+    return {n: cache[n] for n in fazendas}
+
+def _coherence_error(p: MobileInput) -> str | None:
+    if p.inseminadas > p.aptas:
+        return "inseminadas não pode ser maior que aptas"
+    if p.gestantes > p.inseminadas:
+        return "gestantes não pode ser maior que inseminadas"
+    return None
+
+def bulk_insert_inputs(
+    db: Session,
+    payloads: list[MobileInput],
+    linhas: list[int] | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """
+    Grava várias medições de uma vez. Linhas incoerentes (ex.: inseminadas > aptas)
+    viram avisos e não interrompem o lote. `linhas` permite informar o número
+    original de cada payload nos avisos (ex.: linha da planilha).
+    Retorna {"rows", "inseridas", "warnings"} no formato de `IngestReport`.
+    """
+    linhas = linhas or list(range(1, len(payloads) + 1))
+    warnings = []
+    validos = []
+    for linha, p in zip(linhas, payloads):
+        erro = _coherence_error(p)
+        if erro:
+            warnings.append(f"Linha {linha}: {erro}")
+        else:
+            validos.append((linha, p))
+
+    # Produtor/município/estado vêm da primeira linha de cada fazenda
+    fazendas: dict[str, dict] = {}
+    for _, p in validos:
+        fazendas.setdefault(p.fazenda, {"produtor": p.produtor, "municipio": p.municipio, "estado": p.estado})
+    farm_ids = resolve_farm_ids(db, fazendas)
+
+    medicoes = [
+        (linha, farm_ids[p.fazenda], p.data, p.aptas, p.inseminadas, p.gestantes, p.partos or 0)
+        for linha, p in validos
+    ]
+    inseridas, erros = _insert_chunks(db, medicoes, chunk_size)
+    warnings.extend(erros)
+
+    logger.info(f"Ingestão em lote: {inseridas}/{len(payloads)} medições gravadas")
+    return {"rows": len(payloads), "inseridas": inseridas, "warnings": warnings}
+
+def bulk_insert_frame(db: Session, lote, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Grava um lote colunar já validado por `app.etl.cleaning.normalize_frame`
+    (colunas linha, fazenda, data, aptas, inseminadas, gestantes, partos).
+    """
+    if len(lote) == 0:
+        return {"rows": 0, "inseridas": 0, "warnings": []}
+
+    farm_ids = resolve_farm_ids(db, {nome: {} for nome in lote["fazenda"].unique()})
+    ids = lote["fazenda"].map(farm_ids)
+    medicoes = list(zip(
+        lote["linha"].tolist(), ids.tolist(), lote["data"].tolist(),
+        *(lote[tipo].tolist() for tipo in TIPOS),
+    ))
+    inseridas, warnings = _insert_chunks(db, medicoes, chunk_size)
+
+    logger.info(f"Ingestão em lote: {inseridas}/{len(lote)} medições gravadas")
+    return {"rows": len(lote), "inseridas": inseridas, "warnings": warnings}
+
+def new_stream_report() -> dict:
+    return {"rows": 0, "inseridas": 0, "warnings": [], "chunks": []}
+
+def insert_stream_block(db: Session, report: dict, lote, avisos: list[str], chunk_size: int = CHUNK_SIZE):
+    """Grava um bloco do streaming e acumula o resultado em `report`."""
+    parcial = bulk_insert_frame(db, lote, chunk_size)
+    avisos = avisos + parcial["warnings"]
+    report["rows"] += parcial["rows"]
+    report["inseridas"] += parcial["inseridas"]
+    report["warnings"].extend(avisos)
+    report["chunks"].append({
+        "bloco": len(report["chunks"]) + 1,
+        "rows": parcial["rows"],
+        "inseridas": parcial["inseridas"],
+        "avisos": len(avisos),
+        "inseridas_acumuladas": report["inseridas"],
+    })
+
+def _insert_chunks(db: Session, medicoes: list[tuple], chunk_size: int):
+    """
+    Grava medições (linha, fazenda_id, data, aptas, inseminadas, gestantes, partos)
+    em blocos de `chunk_size`, um commit por bloco. Retorna (gravadas, avisos).
+    """
+    inseridas = 0
+    warnings = []
+    inicio = time.perf_counter()
+    for i in range(0, len(medicoes), chunk_size):
+        bloco = medicoes[i:i + chunk_size]
+        linhas = [
+            {"fazenda_id": fazenda_id, "data": data, **{t: int(v) for t, v in zip(TIPOS, valores)}}
+            for _, fazenda_id, data, *valores in bloco
+        ]
+        try:
+            upsert_medicoes(db, linhas)
+            db.commit()
+            inseridas += len(bloco)
+        except Exception as e:
+            db.rollback()
+            warnings.append(f"Linhas {bloco[0][0]}-{bloco[-1][0]} não gravadas: {getattr(e, 'orig', e)}")
+    record_ingest(inseridas, time.perf_counter() - inicio)
+    return inseridas, warnings
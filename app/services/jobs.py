@@ -0,0 +1,298 @@
+"""
+Jobs em segundo plano: importações de planilhas e relatórios PDF/XLSX.
+
+O estado de cada job fica na tabela `jobs`. A execução roda num pool de threads
+do próprio processo (JOBS_WORKERS), com fila limitada (JOBS_MAX_PENDING); a
+renderização dos relatórios continua no pool de processos de
+`app.services.report_batch`.
+
+Um job só roda depois de ser "reservado" com um UPDATE condicional
+(pendente → executando), então vários workers do uvicorn podem retomar a mesma
+tabela sem executar o mesmo job duas vezes. Enquanto roda, o job renova
+`atualizado_em` a cada JOBS_STALE_S/4; no startup, jobs pendentes e jobs
+"executando" sem atualização há JOBS_STALE_S (processo que morreu) voltam para
+a fila. Reexecutar uma importação interrompida é seguro: a gravação é um
+upsert por (fazenda, data).
+"""
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import JOBS_PENDING, JOBS_FINISHED, JOBS_SECONDS, REPORT_RENDER
+from app.models.base import SessionLocal
+from app.models.job import Job
+
+TIPOS = ("importacao", "relatorio")
+PENDENTE, EXECUTANDO, CONCLUIDO, ERRO = "pendente", "executando", "concluido", "erro"
+FORMATOS_RELATORIO = ("pdf", "xlsx")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+_pool: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_na_fila = 0  # jobs submetidos neste processo e ainda não encerrados
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)  # UTC sem fuso (igual no SQLite e no Postgres)
+
+def job_pool() -> ThreadPoolExecutor:
+    """Pool de threads dos jobs, criado no primeiro uso."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.JOBS_WORKERS, thread_name_prefix="job")
+        return _pool
+
+def shutdown_job_pool():
+    """Para o pool sem esperar: jobs não iniciados continuam pendentes na tabela."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _remove(path: str | None):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+def job_file(job_id: str, sufixo: str) -> str:
+    os.makedirs(settings.JOBS_DIR, exist_ok=True)
+    return os.path.join(settings.JOBS_DIR, f"{job_id}{sufixo}")
+
+
+# ==========================================================
+# Fila
+# ==========================================================
+def enqueue(db: Session, tipo: str, parametros: dict, job_id: str | None = None) -> dict:
+    """Registra o job como pendente e o coloca na fila deste processo."""
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de job inválido: {tipo}")
+    global _na_fila
+    with _lock:
+        if _na_fila >= settings.JOBS_MAX_PENDING:
+            raise JobQueueFull(f"Fila de jobs cheia ({settings.JOBS_MAX_PENDING}); tente novamente mais tarde")
+        _na_fila += 1
+    try:
+        agora = _agora()
+        job = Job(id=job_id or new_job_id(), tipo=tipo, status=PENDENTE, progresso=0.0,
+                  parametros=parametros, criado_em=agora, atualizado_em=agora)
+        db.add(job)
+        db.commit()
+    except Exception:
+        _done()
+        raise
+    _submit(job.id)
+    return job_status(job)
+
+def _submit(job_id: str):
+    JOBS_PENDING.set(_na_fila)
+    job_pool().submit(_run, job_id)
+
+def _done():
+    global _na_fila
+    with _lock:
+        _na_fila -= 1
+        JOBS_PENDING.set(_na_fila)
+
+def resume_jobs() -> int:
+    """
+    Startup: remove jobs antigos, devolve à fila os "executando" abandonados e
+    submete os pendentes (mesmo acima de JOBS_MAX_PENDING). Retorna quantos submeteu.
+    """
+    global _na_fila
+    prune_jobs()
+    with SessionLocal() as db:
+        limite = _agora() - timedelta(seconds=settings.JOBS_STALE_S)
+        db.execute(
+            update(Job).where(Job.status == EXECUTANDO, Job.atualizado_em < limite).values(status=PENDENTE)
+        )
+        db.commit()
+        ids = db.execute(select(Job.id).where(Job.status == PENDENTE).order_by(Job.criado_em)).scalars().all()
+    with _lock:
+        _na_fila += len(ids)
+    for job_id in ids:
+        _submit(job_id)
+    if ids:
+        logger.info(f"{len(ids)} jobs pendentes retomados")
+    return len(ids)
+
+def prune_jobs():
+    """Apaga jobs encerrados há mais de JOBS_TTL_H horas e os seus arquivos."""
+    limite = _agora() - timedelta(hours=settings.JOBS_TTL_H)
+    with SessionLocal() as db:
+        antigos = db.execute(
+            select(Job.id, Job.arquivo, Job.parametros)
+            .where(Job.status.in_((CONCLUIDO, ERRO)), Job.concluido_em < limite)
+        ).all()
+        for _, arquivo, parametros in antigos:
+            _remove(arquivo)
+            _remove((parametros or {}).get("arquivo"))
+        if antigos:
+            db.execute(delete(Job).where(Job.id.in_([j.id for j in antigos])))
+            db.commit()
+
+
+# ==========================================================
+# Execução
+# ==========================================================
+def _claim(db: Session, job_id: str) -> Job | None:
+    # Reserva atômica: só um processo/thread passa de pendente para executando
+    agora = _agora()
+    r = db.execute(
+        update(Job).where(Job.id == job_id, Job.status == PENDENTE)
+        .values(status=EXECUTANDO, progresso=0.0, atualizado_em=agora)
+    )
+    db.commit()
+    return db.get(Job, job_id) if r.rowcount == 1 else None
+
+def _update(db: Session, job_id: str, **valores):
+    db.execute(update(Job).where(Job.id == job_id).values(atualizado_em=_agora(), **valores))
+    db.commit()
+
+def _heartbeat(job_id: str, parar: threading.Event):
+    # Renova atualizado_em enquanto o job roda, mesmo dentro de um bloco longo sem
+    # progresso: resume_jobs (de outro worker) só devolve à fila jobs sem sinal
+    # há JOBS_STALE_S, ou seja, de processos que morreram
+    intervalo = max(settings.JOBS_STALE_S / 4, 1)
+    while not parar.wait(intervalo):
+        try:
+            with SessionLocal() as db:
+                db.execute(update(Job).where(Job.id == job_id, Job.status == EXECUTANDO).values(atualizado_em=_agora()))
+                db.commit()
+        except Exception:
+            logger.exception(f"Falha ao renovar o job {job_id}")
+
+def _run(job_id: str):
+    inicio = time.perf_counter()
+    tipo = status = None
+    parar = threading.Event()
+    try:
+        with SessionLocal() as db:
+            job = _claim(db, job_id)
+            if job is None:
+                return
+            tipo, parametros = job.tipo, dict(job.parametros)
+            threading.Thread(target=_heartbeat, args=(job_id, parar), name=f"job-hb-{job_id[:8]}", daemon=True).start()
+
+            def progresso(valor: float | None):
+                _update(db, job_id, progresso=valor)
+
+            try:
+                resultado, arquivo = _HANDLERS[tipo](db, job_id, parametros, progresso)
+                status = CONCLUIDO
+                _update(db, job_id, status=status, progresso=1.0, resultado=resultado, arquivo=arquivo,
+                        concluido_em=_agora())
+            except Exception as e:
+                db.rollback()
+                status = ERRO
+                logger.exception(f"Job {job_id} ({tipo}) falhou")
+                _update(db, job_id, status=status, erro=str(getattr(e, "orig", e)), concluido_em=_agora())
+    finally:
+        parar.set()
+        _done()
+        if status is not None:
+            JOBS_FINISHED.inc(tipo=tipo, status=status)
+            JOBS_SECONDS.observe(time.perf_counter() - inicio, tipo=tipo)
+
+def _run_import(db: Session, job_id: str, parametros: dict, progresso):
+    """Importa a planilha guardada em `parametros["arquivo"]` em blocos (modo streaming)."""
+    from app.etl.cleaning import estimate_rows, iter_normalized_chunks
+    from app.services.ingest import new_stream_report, insert_stream_block
+
+    path = parametros["arquivo"]
+    lidas = 0  # linhas lidas, inclusive as rejeitadas (report["rows"] conta só as válidas)
+
+    def ao_ler(n: int):
+        nonlocal lidas
+        lidas = n
+
+    report = new_stream_report()
+    try:
+        total = estimate_rows(path)
+        for lote, avisos in iter_normalized_chunks(path, settings.INGEST_CHUNK_ROWS, ao_ler=ao_ler):
+            insert_stream_block(db, report, lote, avisos)
+            progresso(min(lidas / total, 0.99) if total else None)
+    finally:
+        # Sucesso ou erro, o job termina aqui; só uma queda do processo deixa o
+        # arquivo para a retomada
+        _remove(path)
+    return report, None
+
+def _run_report(db: Session, job_id: str, parametros: dict, progresso):
+    """Gera (ou reaproveita do cache de relatórios) o PDF/XLSX de uma fazenda."""
+    from app.services import report_cache
+    from app.services.kpi import compute_kpis_for_farm
+    from app.services.report_batch import render_pool, render_bytes, batch_filename
+
+    fazenda_id, fmt = parametros["fazenda_id"], parametros["formato"]
+    inicio, fim = date.fromisoformat(parametros["inicio"]), date.fromisoformat(parametros["fim"])
+    key = report_cache.report_key(db, fazenda_id, inicio, fim, fmt)
+    f = report_cache.open_cached(key, fmt)
+    if f is not None:
+        with f:
+            data = f.read()
+    else:
+        k = compute_kpis_for_farm(db, fazenda_id, inicio, fim)
+        progresso(0.2)
+        with REPORT_RENDER.time(formato=fmt):
+            data = render_pool().submit(render_bytes, fmt, k, inicio, fim).result()
+        report_cache.store(key, fazenda_id, inicio, fim, fmt, data)
+
+    destino = job_file(job_id, f".{fmt}")
+    fd, tmp = tempfile.mkstemp(dir=settings.JOBS_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as out:
+        out.write(data)
+    os.replace(tmp, destino)
+    nome = batch_filename({"fazenda_id": fazenda_id}, fmt)
+    return {"nome_arquivo": nome, "bytes": len(data)}, destino
+
+_HANDLERS = {"importacao": _run_import, "relatorio": _run_report}
+
+
+# ==========================================================
+# Consulta
+# ==========================================================
+def get_job(db: Session, job_id: str) -> Job:
+    job = db.get(Job, job_id)
+    if job is None:
+        raise ValueError("Job não encontrado")
+    return job
+
+def job_status(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "status": job.status,
+        "progresso": job.progresso,
+        "parametros": {k: v for k, v in job.parametros.items() if k != "arquivo"},
+        "resultado": job.resultado,
+        "erro": job.erro,
+        "criado_em": job.criado_em,
+        "atualizado_em": job.atualizado_em,
+        "concluido_em": job.concluido_em,
+        "download": f"/jobs/{job.id}/resultado" if job.status == CONCLUIDO else None,
+    }
+
+def validate_report_params(fazenda_id: int, inicio: date, fim: date, formato: str) -> dict:
+    if formato not in FORMATOS_RELATORIO:
+        raise ValueError(f"Formato inválido: {formato}")
+    if fim < inicio:
+        raise ValueError("fim deve ser posterior a inicio")
+    return {"fazenda_id": fazenda_id, "inicio": str(inicio), "fim": str(fim), "formato": formato}
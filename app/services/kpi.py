@@ -1,12 +1,29 @@
+import threading
+from collections import OrderedDict
 from datetime import date, timedelta
+from statistics import fmean, quantiles
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy import select, func, and_, union_all, cast, literal_column, distinct, Date, Integer
 from app.models.fazenda import Fazenda
-from app.models.evento import EventoRepro
+from app.models.medicao import Medicao, MEDIDAS
+from app.models.ciclo import Ciclo
 from app.schemas.ingest import MobileInput
+from app.services.medicoes import upsert_medicoes
+from app.services.data_version import get_data_version
+from app.services.rollup import window_selects, month_start, next_month
+from app.core.config import settings
 from app.core.logging import logger
+from app.core.profiling import hot_path
 
 GESTATION_DAYS = 283
+TIPOS = MEDIDAS
+# Colunas das fontes de _window_source: medida de origem de cada total (None = 0)
+NO_PERIODO = {**{t: t for t in TIPOS}, "partos_previstos": None}
+PREVISTOS = {**{t: None for t in TIPOS}, "partos_previstos": "gestantes"}
+BENCHMARK_METRICS = ("TS", "TC", "TP", "partos_previstos")
+CALENDAR_GRANULARITIES = ("semana", "mes")
+SERIE_GRANULARITIES = ("semana", "mes", "trimestre")
+AGGREGATE_LEVELS = ("produtor", "municipio", "estado")
 
 def _get_or_create_farm(db: Session, nome: str, produtor=None, municipio=None, estado=None) -> Fazenda:
     farm = db.execute(select(Fazenda).where(Fazenda.nome == nome)).scalar_one_or_none()
@@ -28,65 +45,194 @@ def insert_mobile_input(db: Session, payload: MobileInput):
     if payload.gestantes > payload.inseminadas:
         raise ValueError("gestantes não pode ser maior que inseminadas")
 
-    # Inserir eventos (uma linha por tipo)
-    for tipo, valor in [
-        ("aptas", payload.aptas),
-        ("inseminadas", payload.inseminadas),
-        ("gestantes", payload.gestantes),
-        ("partos", payload.partos or 0),
-    ]:
-        evt = EventoRepro(fazenda_id=farm.id, data=payload.data, tipo=tipo, valor=int(valor))
-        db.add(evt)
-
+    # Uma linha por fazenda/dia; reenviar a mesma medição sobrescreve em vez de duplicar
+    upsert_medicoes(db, [{
+        "fazenda_id": farm.id,
+        "data": payload.data,
+        "aptas": payload.aptas,
+        "inseminadas": payload.inseminadas,
+        "gestantes": payload.gestantes,
+        "partos": payload.partos or 0,
+    }])
     db.commit()
     logger.info(f"Nova medição inserida para {farm.nome} em {payload.data}")
     return type("InsertResult", (), {"fazenda_id": farm.id, "data": payload.data})
 
-def _sum_by_type(db: Session, fazenda_id: int, tipo: str, inicio: date, fim: date) -> int:
-    stmt = select(func.coalesce(func.sum(EventoRepro.valor), 0)).where(
-        EventoRepro.fazenda_id == fazenda_id,
-        EventoRepro.tipo == tipo,
-        EventoRepro.data >= inicio,
-        EventoRepro.data <= fim,
+def _window_source(inicio: date, fim: date, fazenda_id: int | None = None):
+    """
+    Subconsulta (fazenda_id, aptas, inseminadas, gestantes, partos, partos_previstos)
+    com tudo o que entra no cálculo: medições do período e gestantes cujo parto
+    estimado (data + 283) cai no período. Os limites deslocados são calculados
+    aqui para o predicado usar a chave (fazenda_id, data).
+    """
+    prev_inicio = inicio - timedelta(days=GESTATION_DAYS)
+    prev_fim = fim - timedelta(days=GESTATION_DAYS)
+    partes = window_selects(inicio, fim, NO_PERIODO, fazenda_id) + window_selects(
+        prev_inicio, prev_fim, PREVISTOS, fazenda_id
     )
-    return int(db.execute(stmt).scalar() or 0)
-
-def _expected_births(db: Session, fazenda_id: int, inicio: date, fim: date) -> int:
-    # Partos previstos = gestantes cujo parto estimado (data + 283) cai no período
-    from sqlalchemy import and_
-    stmt = select(func.sum(EventoRepro.valor)).where(
-        and_(
-            EventoRepro.fazenda_id == fazenda_id,
-            EventoRepro.tipo == "gestantes",
-            EventoRepro.data + timedelta(days=GESTATION_DAYS) >= inicio,
-            EventoRepro.data + timedelta(days=GESTATION_DAYS) <= fim,
-        )
-    )
-    return int(db.execute(stmt).scalar() or 0)
+    return union_all(*partes).subquery("fonte")
+
+def _totals_columns(fonte):
+    """Soma de cada medida no período e partos previstos, na mesma varredura."""
+    return [func.coalesce(func.sum(fonte.c[chave]), 0).label(chave) for chave in (*TIPOS, "partos_previstos")]
 
+def _engine_snapshot(db: Session):
+    # Motor NumPy opcional (ver app.services.kpi_engine); None = usar SQL (motor
+    # carregando ou desatualizado)
+    if not settings.KPI_ENGINE:
+        return None
+    from app.services.kpi_engine import snapshot
+
+    return snapshot(db)
+
+@hot_path
 def compute_kpis_for_farm(db: Session, fazenda_id: int, inicio: date, fim: date):
-    farm = db.get(Fazenda, fazenda_id)
-    if not farm:
+    snap = _engine_snapshot(db)
+    if snap is not None and fazenda_id in snap.nomes:
+        return _farm_result(snap.linha(fazenda_id, inicio, fim), inicio, fim)
+
+    # Uma única consulta: dados da fazenda + totais por tipo + partos previstos
+    fonte = _window_source(inicio, fim, fazenda_id)
+    stmt = (
+        select(Fazenda.id, Fazenda.nome, *_totals_columns(fonte))
+        .outerjoin(fonte, fonte.c.fazenda_id == Fazenda.id)
+        .where(Fazenda.id == fazenda_id)
+        .group_by(Fazenda.id, Fazenda.nome)
+    )
+    row = db.execute(stmt).one_or_none()
+    if not row:
         raise ValueError("Fazenda não encontrada")
+    return _farm_result(row, inicio, fim)
+
+def compute_kpis_for_farms(
+    db: Session,
+    inicio: date,
+    fim: date,
+    fazenda_ids: list[int] | None = None,
+    produtor: str | None = None,
+    municipio: str | None = None,
+    estado: str | None = None,
+) -> list[dict]:
+    """
+    KPIs de várias fazendas (por ids e/ou produtor/município/estado) numa única
+    consulta agrupada. Cada item tem o mesmo formato de `compute_kpis_for_farm`.
+    """
+    fonte = _window_source(inicio, fim)
+    stmt = (
+        select(Fazenda.id, Fazenda.nome, *_totals_columns(fonte))
+        .outerjoin(fonte, fonte.c.fazenda_id == Fazenda.id)
+        .group_by(Fazenda.id, Fazenda.nome)
+        .order_by(Fazenda.id)
+    )
+    if fazenda_ids is not None:
+        stmt = stmt.where(Fazenda.id.in_(fazenda_ids))
+    for col, valor in ((Fazenda.produtor, produtor), (Fazenda.municipio, municipio), (Fazenda.estado, estado)):
+        if valor is not None:
+            stmt = stmt.where(col == valor)
+    return [_farm_result(row, inicio, fim) for row in db.execute(stmt)]
+
+# Resultados de aggregate_kpis por (nível, período, filtros), válidos enquanto
+# a versão dos dados (get_data_version) não muda
+_agg_cache: OrderedDict = OrderedDict()
+_agg_lock = threading.Lock()
+
+def aggregate_kpis(
+    db: Session,
+    nivel: str,
+    inicio: date,
+    fim: date,
+    produtor: str | None = None,
+    municipio: str | None = None,
+    estado: str | None = None,
+) -> dict:
+    """
+    Totais e TS/TC/TP somados por produtor, município ou estado, numa única
+    consulta (fazendas + fonte do período, agrupadas pelo nível). Fazendas sem
+    o campo preenchido formam o grupo `None`.
+    """
+    if nivel not in AGGREGATE_LEVELS:
+        raise ValueError(f"Nível inválido: {nivel} (use {', '.join(AGGREGATE_LEVELS)})")
+    if fim < inicio:
+        raise ValueError("fim deve ser posterior a inicio")
+
+    # Versão lida antes da consulta: uma gravação no meio só torna a entrada
+    # mais nova que a versão registrada, e a próxima chamada recalcula
+    versao = get_data_version(db)
+    chave = (nivel, inicio, fim, produtor, municipio, estado)
+    with _agg_lock:
+        hit = _agg_cache.get(chave)
+        if hit is not None and hit["versao"] == versao:
+            _agg_cache.move_to_end(chave)
+            return hit
+
+    grupo = getattr(Fazenda, nivel)
+    fonte = _window_source(inicio, fim)
+    stmt = (
+        select(grupo.label("grupo"), func.count(distinct(Fazenda.id)).label("fazendas"), *_totals_columns(fonte))
+        .select_from(Fazenda)
+        .outerjoin(fonte, fonte.c.fazenda_id == Fazenda.id)
+        .group_by(grupo)
+        .order_by(grupo)
+    )
+    filtros = {"produtor": produtor, "municipio": municipio, "estado": estado}
+    for campo, valor in filtros.items():
+        if valor is not None:
+            stmt = stmt.where(getattr(Fazenda, campo) == valor)
+
+    grupos = [
+        {"grupo": row.grupo, "fazendas": row.fazendas, **_totais_kpis(row)}
+        for row in db.execute(stmt)
+    ]
 
-    aptas = _sum_by_type(db, fazenda_id, "aptas", inicio, fim)
-    inseminadas = _sum_by_type(db, fazenda_id, "inseminadas", inicio, fim)
-    gestantes = _sum_by_type(db, fazenda_id, "gestantes", inicio, fim)
-    partos_real = _sum_by_type(db, fazenda_id, "partos", inicio, fim)
-    partos_prev = _expected_births(db, fazenda_id, inicio, fim)
+    resultado = {
+        "nivel": nivel,
+        "inicio": inicio,
+        "fim": fim,
+        "filtros": {k: v for k, v in filtros.items() if v is not None},
+        "grupos": grupos,
+        "versao": versao,
+    }
+    with _agg_lock:
+        _agg_cache[chave] = resultado
+        _agg_cache.move_to_end(chave)
+        while len(_agg_cache) > settings.KPI_AGG_CACHE_ITEMS:
+            _agg_cache.popitem(last=False)
+    return resultado
 
-    def pct(n, d):
-        if d <= 0:
-            return 0.0
-        return round(100.0 * n / d, 2)
+def _pct(n, d):
+    if d <= 0:
+        return 0.0
+    return round(100.0 * n / d, 2)
 
-    TS = pct(inseminadas, aptas)
-    TC = pct(gestantes, inseminadas)
+def _kpis(aptas: int, inseminadas: int, gestantes: int, partos_prev: int) -> dict:
+    TS = _pct(inseminadas, aptas)
+    TC = _pct(gestantes, inseminadas)
     TP = round((TS / 100.0) * (TC / 100.0) * 100.0, 2)
+    return {"TS": TS, "TC": TC, "TP": TP, "partos_previstos": partos_prev}
+
+def _totais_kpis(row) -> dict:
+    # "totais" e "kpis" de uma linha com as colunas de _totals_columns
+    totais = {
+        "aptas": int(row.aptas),
+        "inseminadas": int(row.inseminadas),
+        "gestantes": int(row.gestantes),
+        "partos_realizados": int(row.partos),
+        "partos_previstos": int(row.partos_previstos),
+    }
+    kpis = _kpis(totais["aptas"], totais["inseminadas"], totais["gestantes"], totais["partos_previstos"])
+    return {"totais": totais, "kpis": kpis}
+
+def _farm_result(row, inicio: date, fim: date) -> dict:
+    # Monta a resposta de KPIs a partir de uma linha com as colunas de _totals_columns
+    aptas = int(row.aptas)
+    inseminadas = int(row.inseminadas)
+    gestantes = int(row.gestantes)
+    partos_real = int(row.partos)
+    partos_prev = int(row.partos_previstos)
 
     return {
-        "fazenda_id": farm.id,
-        "fazenda_nome": farm.nome,
+        "fazenda_id": row.id,
+        "fazenda_nome": row.nome,
         "periodo": {"inicio": str(inicio), "fim": str(fim)},
         "totais": {
             "aptas": aptas,
@@ -95,18 +241,355 @@ def compute_kpis_for_farm(db: Session, fazenda_id: int, inicio: date, fim: date)
             "partos_realizados": partos_real,  # ADICIONADO
             "partos_previstos": partos_prev,
         },
-        "kpis": {"TS": TS, "TC": TC, "TP": TP, "partos_previstos": partos_prev},
+        "kpis": _kpis(aptas, inseminadas, gestantes, partos_prev),
     }
 
-def benchmark_metric(db: Session, metric: str, inicio: date, fim: date):
-    farms = db.query(Fazenda).all()
+def _bucket_start(d: date, granularidade: str) -> date:
+    if granularidade == "semana":
+        return d - timedelta(days=d.weekday())  # segunda-feira
+    if granularidade == "trimestre":
+        return date(d.year, 3 * ((d.month - 1) // 3) + 1, 1)
+    return month_start(d)
+
+def _next_bucket(d: date, granularidade: str) -> date:
+    if granularidade == "semana":
+        return d + timedelta(days=7)
+    if granularidade == "trimestre":
+        return next_month(next_month(next_month(d)))
+    return next_month(d)
+
+def _bucket_expr(dialect: str, granularidade: str, dias: int = 0):
+    """
+    Início do bucket (semana começando na segunda, mês ou trimestre) de
+    `Medicao.data + dias`, calculado no banco. Mesmas datas de `_bucket_start`.
+    """
+    if dialect == "sqlite":
+        desloc = f"{dias:+d} days"
+        if granularidade == "semana":
+            return func.date(Medicao.data, desloc, "weekday 0", "-6 days", type_=Date)
+        if granularidade == "trimestre":
+            mes = cast(func.strftime("%m", func.date(Medicao.data, desloc)), Integer)
+            return func.date(
+                Medicao.data, desloc, "start of month", func.printf("-%d months", (mes - 1) % 3), type_=Date
+            )
+        return func.date(Medicao.data, desloc, "start of month", type_=Date)
+    unidade = {"semana": "week", "mes": "month", "trimestre": "quarter"}[granularidade]
+    return cast(func.date_trunc(unidade, Medicao.data + dias), Date)
+
+def projected_calvings(
+    db: Session,
+    fazenda_id: int,
+    inicio: date | None = None,
+    fim: date | None = None,
+    granularidade: str = "semana",
+):
+    """
+    Calendário de partos previstos (gestantes + 283 dias) entre `inicio` e `fim`,
+    agrupado por semana ou mês. Uma consulta sobre uma faixa da chave
+    (fazenda_id, data) de `medicoes`; os buckets sem partos aparecem com zero.
+    O primeiro e o último bucket são recortados em `inicio`/`fim`.
+    """
+    if granularidade not in CALENDAR_GRANULARITIES:
+        raise ValueError(f"Granularidade inválida: {granularidade} (use {', '.join(CALENDAR_GRANULARITIES)})")
+    inicio = inicio or date.today()
+    fim = fim or inicio + timedelta(days=GESTATION_DAYS)
+    if fim < inicio:
+        raise ValueError("fim deve ser posterior a inicio")
+
+    gestacao = timedelta(days=GESTATION_DAYS)
+    stmt = (
+        select(Fazenda.nome, Medicao.data, Medicao.gestantes.label("valor"))
+        .outerjoin(Medicao, and_(
+            Medicao.fazenda_id == Fazenda.id,
+            Medicao.data.between(inicio - gestacao, fim - gestacao),
+        ))
+        .where(Fazenda.id == fazenda_id)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        raise ValueError("Fazenda não encontrada")
+
+    por_bucket: dict[date, int] = {}
+    for r in rows:
+        if r.data is not None and r.valor:
+            b = _bucket_start(r.data + gestacao, granularidade)
+            por_bucket[b] = por_bucket.get(b, 0) + int(r.valor)
+
+    buckets = []
+    b = _bucket_start(inicio, granularidade)
+    while b <= fim:
+        prox = _next_bucket(b, granularidade)
+        buckets.append({
+            "inicio": max(b, inicio),
+            "fim": min(prox - timedelta(days=1), fim),
+            "partos_previstos": por_bucket.get(b, 0),
+        })
+        b = prox
+
+    return {
+        "fazenda_id": fazenda_id,
+        "fazenda_nome": rows[0].nome,
+        "granularidade": granularidade,
+        "inicio": inicio,
+        "fim": fim,
+        "total": sum(x["partos_previstos"] for x in buckets),
+        "buckets": buckets,
+    }
+
+def kpi_series(
+    db: Session,
+    fazenda_id: int,
+    inicio: date,
+    fim: date,
+    granularidade: str = "mes",
+):
+    """
+    Série de totais e KPIs de uma fazenda por semana, mês ou trimestre.
+    Uma única consulta agrupa no banco as medições do período pelo bucket da data
+    e as gestantes pelo bucket do parto estimado (data + 283). O primeiro e o
+    último bucket são recortados em `inicio`/`fim`, então os totais da série
+    somam os mesmos valores de `compute_kpis_for_farm` no período.
+    """
+    if granularidade not in SERIE_GRANULARITIES:
+        raise ValueError(f"Granularidade inválida: {granularidade} (use {', '.join(SERIE_GRANULARITIES)})")
+    if fim < inicio:
+        raise ValueError("fim deve ser posterior a inicio")
+
+    dialect = db.get_bind().dialect.name
+    gestacao = timedelta(days=GESTATION_DAYS)
+    def fonte_select(colunas: dict, dias: int, a: date, b: date):
+        cols = [
+            (getattr(Medicao, origem) if origem else literal_column("0")).label(rotulo)
+            for rotulo, origem in colunas.items()
+        ]
+        return select(
+            Medicao.fazenda_id, _bucket_expr(dialect, granularidade, dias).label("bucket"), *cols
+        ).where(Medicao.fazenda_id == fazenda_id, Medicao.data.between(a, b))
+
+    no_periodo = fonte_select(NO_PERIODO, 0, inicio, fim)
+    previstos = fonte_select(PREVISTOS, GESTATION_DAYS, inicio - gestacao, fim - gestacao)
+    fonte = union_all(no_periodo, previstos).subquery("fonte")
+    stmt = (
+        select(Fazenda.nome, fonte.c.bucket, *_totals_columns(fonte))
+        .outerjoin(fonte, fonte.c.fazenda_id == Fazenda.id)
+        .where(Fazenda.id == fazenda_id)
+        .group_by(Fazenda.nome, fonte.c.bucket)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        raise ValueError("Fazenda não encontrada")
+    por_bucket = {r.bucket: r for r in rows if r.bucket is not None}
+
+    serie = []
+    b = _bucket_start(inicio, granularidade)
+    while b <= fim:
+        prox = _next_bucket(b, granularidade)
+        r = por_bucket.get(b)
+        aptas, inseminadas, gestantes, partos, prev = (
+            (int(r.aptas), int(r.inseminadas), int(r.gestantes), int(r.partos), int(r.partos_previstos))
+            if r is not None else (0, 0, 0, 0, 0)
+        )
+        serie.append({
+            "inicio": max(b, inicio),
+            "fim": min(prox - timedelta(days=1), fim),
+            "totais": {
+                "aptas": aptas,
+                "inseminadas": inseminadas,
+                "gestantes": gestantes,
+                "partos_realizados": partos,
+                "partos_previstos": prev,
+            },
+            "kpis": _kpis(aptas, inseminadas, gestantes, prev),
+        })
+        b = prox
+
+    return {
+        "fazenda_id": fazenda_id,
+        "fazenda_nome": rows[0].nome,
+        "granularidade": granularidade,
+        "inicio": inicio,
+        "fim": fim,
+        "serie": serie,
+    }
+
+def _shift_date(dialect: str, col, dias: int):
+    """`col + dias` calculado no banco (coluna de data)."""
+    if dialect == "sqlite":
+        return func.date(col, f"{dias:+d} days", type_=Date)
+    return col + dias
+
+def cycle_kpis(
+    db: Session,
+    fazenda_id: int | None = None,
+    inicio: date | None = None,
+    fim: date | None = None,
+    ciclo_ids: list[int] | None = None,
+    produtor: str | None = None,
+    municipio: str | None = None,
+    estado: str | None = None,
+) -> list[dict]:
+    """
+    Totais, TS/TC/TP e partos previstos de cada ciclo (tabela `ciclos`), numa única
+    consulta: os ciclos selecionados são unidos às medições da fazenda no intervalo
+    do ciclo (e no intervalo deslocado de 283 dias, para os partos previstos) e
+    agrupados por ciclo. Filtros: fazenda, ciclos que cruzam [inicio, fim], ids e
+    produtor/município/estado.
+
+    Os ciclos saem ordenados por fazenda e data de início; `variacao` traz a
+    diferença de TS/TC/TP em relação ao ciclo anterior da mesma fazenda na lista.
+    """
+    if inicio and fim and fim < inicio:
+        raise ValueError("fim deve ser posterior a inicio")
+
+    alvo = select(Ciclo.id, Ciclo.fazenda_id, Ciclo.inicio, Ciclo.fim).join(Fazenda, Fazenda.id == Ciclo.fazenda_id)
+    if fazenda_id is not None:
+        alvo = alvo.where(Ciclo.fazenda_id == fazenda_id)
+    if inicio is not None:
+        alvo = alvo.where(Ciclo.fim >= inicio)
+    if fim is not None:
+        alvo = alvo.where(Ciclo.inicio <= fim)
+    if ciclo_ids is not None:
+        alvo = alvo.where(Ciclo.id.in_(ciclo_ids))
+    for col, valor in ((Fazenda.produtor, produtor), (Fazenda.municipio, municipio), (Fazenda.estado, estado)):
+        if valor is not None:
+            alvo = alvo.where(col == valor)
+    alvo = alvo.cte("alvo")
+
+    # Cada parte é uma faixa (fazenda_id, data) da chave de `medicoes` por ciclo
+    dialect = db.get_bind().dialect.name
+
+    def parte(colunas: dict, dias: int):
+        cols = [
+            (getattr(Medicao, origem) if origem else literal_column("0")).label(rotulo)
+            for rotulo, origem in colunas.items()
+        ]
+        return select(alvo.c.id.label("ciclo_id"), *cols).select_from(alvo).join(Medicao, and_(
+            Medicao.fazenda_id == alvo.c.fazenda_id,
+            Medicao.data.between(_shift_date(dialect, alvo.c.inicio, -dias), _shift_date(dialect, alvo.c.fim, -dias)),
+        ))
+
+    fonte = union_all(parte(NO_PERIODO, 0), parte(PREVISTOS, GESTATION_DAYS)).subquery("fonte")
+    stmt = (
+        select(alvo.c.id, alvo.c.fazenda_id, Fazenda.nome, alvo.c.inicio, alvo.c.fim, *_totals_columns(fonte))
+        .select_from(alvo)
+        .join(Fazenda, Fazenda.id == alvo.c.fazenda_id)
+        .outerjoin(fonte, fonte.c.ciclo_id == alvo.c.id)
+        .group_by(alvo.c.id, alvo.c.fazenda_id, Fazenda.nome, alvo.c.inicio, alvo.c.fim)
+        .order_by(alvo.c.fazenda_id, alvo.c.inicio, alvo.c.id)
+    )
+
+    ciclos = []
+    anterior: dict[int, dict] = {}
+    for row in db.execute(stmt):
+        item = {
+            "ciclo_id": row.id,
+            "fazenda_id": row.fazenda_id,
+            "fazenda_nome": row.nome,
+            "inicio": row.inicio,
+            "fim": row.fim,
+            **_totais_kpis(row),
+        }
+        prev = anterior.get(row.fazenda_id)
+        item["variacao"] = (
+            {m: round(item["kpis"][m] - prev["kpis"][m], 2) for m in ("TS", "TC", "TP")} if prev else None
+        )
+        anterior[row.fazenda_id] = item
+        ciclos.append(item)
+    return ciclos
+
+def farm_cycle_kpis(
+    db: Session,
+    fazenda_id: int,
+    inicio: date | None = None,
+    fim: date | None = None,
+    ciclo_ids: list[int] | None = None,
+) -> dict:
+    """Ciclos de uma fazenda (ver `cycle_kpis`)."""
+    ciclos = cycle_kpis(db, fazenda_id, inicio, fim, ciclo_ids)
+    if ciclos:
+        nome = ciclos[0]["fazenda_nome"]
+    else:
+        nome = db.execute(select(Fazenda.nome).where(Fazenda.id == fazenda_id)).scalar()
+        if nome is None:
+            raise ValueError("Fazenda não encontrada")
+    return {"fazenda_id": fazenda_id, "fazenda_nome": nome, "ciclos": ciclos}
+
+def _quartis(valores: list[float]) -> dict | None:
+    if not valores:
+        return None
+    if len(valores) == 1:
+        q1 = q2 = q3 = valores[0]
+    else:
+        q1, q2, q3 = quantiles(valores, n=4, method="inclusive")
+    return {
+        "min": min(valores),
+        "p25": round(q1, 2),
+        "p50": round(q2, 2),
+        "p75": round(q3, 2),
+        "max": max(valores),
+        "media": round(fmean(valores), 2),
+    }
+
+def benchmark_metric(
+    db: Session,
+    metric: str,
+    inicio: date,
+    fim: date,
+    limit: int | None = None,
+    offset: int = 0,
+    fazenda_id: int | None = None,
+):
+    """
+    Ranking de todas as fazendas por uma métrica (TS, TC, TP ou partos_previstos).
+    Os totais de todas as fazendas vêm de uma única consulta agrupada por fazenda
+    (ou do motor em memória, com KPI_ENGINE=1);
+    `limit`/`offset` paginam o ranking e `fazenda_id` destaca a posição de uma fazenda.
+    """
+    if metric not in BENCHMARK_METRICS:
+        raise ValueError(f"Métrica inválida: {metric} (use {', '.join(BENCHMARK_METRICS)})")
+
+    snap = _engine_snapshot(db)
+    if snap is not None:
+        rows = snap.linhas(inicio, fim)
+    else:
+        fonte = _window_source(inicio, fim)
+        rows = db.execute(
+            select(Fazenda.id, Fazenda.nome, *_totals_columns(fonte))
+            .outerjoin(fonte, fonte.c.fazenda_id == Fazenda.id)
+            .group_by(Fazenda.id, Fazenda.nome)
+        )
     ranking = []
-    for f in farms:
-        k = compute_kpis_for_farm(db, f.id, inicio, fim)
+    for row in rows:
+        k = _farm_result(row, inicio, fim)
         ranking.append({
-            "fazenda_id": f.id,
-            "fazenda_nome": f.nome,
+            "fazenda_id": row.id,
+            "fazenda_nome": row.nome,
             "valor": k["kpis"][metric],
         })
-    ranking.sort(key=lambda x: x["valor"], reverse=True)
-    return {"metric": metric, "inicio": inicio, "fim": fim, "ranking": ranking}
+    ranking.sort(key=lambda x: (-x["valor"], x["fazenda_id"]))
+
+    valores = [r["valor"] for r in ranking]
+    total = len(ranking)
+    for pos, r in enumerate(ranking, start=1):
+        r["posicao"] = pos
+
+    destaque = None
+    if fazenda_id is not None:
+        destaque = next((r for r in ranking if r["fazenda_id"] == fazenda_id), None)
+        if destaque is None:
+            raise ValueError("Fazenda não encontrada")
+        ate = sum(1 for v in valores if v <= destaque["valor"])
+        destaque = {**destaque, "percentil": round(100.0 * ate / total, 2)}
+
+    pagina = ranking[offset:offset + limit] if limit is not None else ranking[offset:]
+    return {
+        "metric": metric,
+        "inicio": inicio,
+        "fim": fim,
+        "ranking": pagina,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "quartis": _quartis(valores),
+        "fazenda": destaque,
+    }
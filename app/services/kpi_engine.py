@@ -0,0 +1,208 @@
+"""
+Motor de KPIs em memória (NumPy), opcional (KPI_ENGINE=1).
+
+Carrega `medicoes` em arrays compactos, ordenados pela chave
+`fazenda_id * 2**22 + ordinal do dia`, com a soma acumulada das quatro medidas
+(matriz linhas × 4). Os totais de qualquer intervalo de uma fazenda saem de duas
+buscas binárias (`searchsorted`) e uma subtração de linhas, e os de todas as
+fazendas de uma vez são a mesma operação vetorizada.
+
+A cada consulta, o snapshot só é usado se nenhuma fazenda tiver versão nova em
+`fazenda_versoes` (renovada em toda gravação); caso contrário a consulta vai
+para o SQL e uma thread própria recarrega só as fazendas alteradas, trocando o
+snapshot inteiro no final. A carga nunca roda na thread de quem consulta (o
+event loop, nas rotas async). Se os dados passarem de KPI_ENGINE_MAX_MB, o
+motor é desligado e as consultas voltam para o SQL.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.base import SessionLocal
+from app.models.fazenda import Fazenda
+from app.models.medicao import Medicao
+from app.models.fazenda_versao import FazendaVersao
+from app.services.kpi import TIPOS, GESTATION_DAYS
+
+STRIDE = 1 << 22  # > ordinal de 9999-12-31
+GESTANTES = TIPOS.index("gestantes")
+BYTES_POR_LINHA = 8 * (1 + 2 * len(TIPOS))  # chave + valores + acumulados (int64)
+# Transações que gravaram com versão "antiga" mas comitaram depois da última
+# verificação ainda são vistas se comitarem dentro desta janela
+MARGEM_VERSAO_US = 300 * 1_000_000
+RETRY_S = 300  # após estourar o orçamento, tenta de novo depois deste tempo
+
+Linha = namedtuple("Linha", "id nome aptas inseminadas gestantes partos partos_previstos")
+
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+
+class Snapshot:
+    """Estado imutável do índice; trocado inteiro a cada atualização."""
+
+    def __init__(self, keys, vals, nomes: dict[int, str], versoes: dict[int, int]):
+        self.keys = keys
+        self.vals = vals
+        self.cum = np.vstack((np.zeros((1, len(TIPOS)), dtype=np.int64), np.cumsum(vals, axis=0, dtype=np.int64)))
+        self.nomes = nomes
+        self.versoes = versoes
+        self.max_versao = max(versoes.values(), default=0)
+        self.max_fazenda = max(nomes, default=0)
+        self.ids = np.array(sorted(nomes), dtype=np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.vals.nbytes + self.cum.nbytes
+
+    def _soma(self, ids: np.ndarray, inicio: date, fim: date) -> np.ndarray:
+        """Matriz (fazendas × 4): somas de cada medida no intervalo."""
+        base = ids * STRIDE
+        lo = np.searchsorted(self.keys, base + inicio.toordinal(), "left")
+        hi = np.searchsorted(self.keys, base + fim.toordinal(), "right")
+        return self.cum[np.maximum(lo, hi)] - self.cum[lo]
+
+    def totais(self, ids: np.ndarray, inicio: date, fim: date) -> np.ndarray:
+        """Matriz (fazendas × 5): somas por medida no período e partos previstos."""
+        gestacao = timedelta(days=GESTATION_DAYS)
+        previstos = self._soma(ids, inicio - gestacao, fim - gestacao)[:, GESTANTES]
+        return np.column_stack((self._soma(ids, inicio, fim), previstos))
+
+    def linha(self, fazenda_id: int, inicio: date, fim: date) -> Linha:
+        t = self.totais(np.array([fazenda_id], dtype=np.int64), inicio, fim)[0]
+        return Linha(fazenda_id, self.nomes[fazenda_id], *(int(x) for x in t))
+
+    def linhas(self, inicio: date, fim: date) -> list[Linha]:
+        """Todas as fazendas (ordem de id), numa única operação vetorizada."""
+        t = self.totais(self.ids, inicio, fim).tolist()
+        return [Linha(int(fid), self.nomes[int(fid)], *vals) for fid, vals in zip(self.ids, t)]
+
+
+def _load_medicoes(db: Session, fazenda_ids=None):
+    """(chaves, matriz de valores) na ordem da chave (fazenda_id, data)."""
+    stmt = (
+        select(Medicao.fazenda_id, Medicao.data, *(getattr(Medicao, t) for t in TIPOS))
+        .order_by(Medicao.fazenda_id, Medicao.data)
+    )
+    if fazenda_ids is not None:
+        stmt = stmt.where(Medicao.fazenda_id.in_(fazenda_ids))
+    keys, vals = [], []
+    for fid, data, *valores in db.execute(stmt):
+        keys.append(fid * STRIDE + data.toordinal())
+        vals.append(valores)
+    keys = np.array(keys, dtype=np.int64)
+    vals = np.array(vals, dtype=np.int64).reshape(len(keys), len(TIPOS))
+    return keys, vals
+
+
+def _check_budget(linhas: int):
+    limite = settings.KPI_ENGINE_MAX_MB * 1024 * 1024
+    if linhas * BYTES_POR_LINHA > limite:
+        raise MemoryBudgetExceeded(f"{linhas} linhas excedem KPI_ENGINE_MAX_MB={settings.KPI_ENGINE_MAX_MB}")
+
+
+def _pendentes(db: Session, snap: Snapshot):
+    """Fazendas com versão diferente da do snapshot e fazendas criadas depois dele."""
+    recentes = db.execute(
+        select(FazendaVersao.fazenda_id, FazendaVersao.versao)
+        .where(FazendaVersao.versao > snap.max_versao - MARGEM_VERSAO_US)
+    ).all()
+    alteradas = {fid: v for fid, v in recentes if snap.versoes.get(fid) != v}
+    novas = dict(db.execute(select(Fazenda.id, Fazenda.nome).where(Fazenda.id > snap.max_fazenda)).all())
+    return alteradas, novas
+
+
+class KPIEngine:
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        self._snap: Snapshot | None = None
+        # Só adquirido sem bloquear; quem adquire inicia a thread, que o libera no final
+        self._atualizando = threading.Lock()
+        self._desligado_ate = 0.0
+
+    def current(self, db: Session) -> Snapshot | None:
+        """
+        Snapshot em dia com o banco, ou None (usar SQL) se estiver desatualizado,
+        ainda não carregado ou fora do orçamento. Não bloqueia: a carga fica
+        para a thread de atualização.
+        """
+        if time.monotonic() < self._desligado_ate:
+            return None
+        snap = self._snap
+        if snap is not None and not any(_pendentes(db, snap)):
+            return snap
+        self.schedule()
+        return None
+
+    def schedule(self):
+        """Inicia a carga/atualização em segundo plano, se não houver uma em andamento."""
+        if not self._atualizando.acquire(blocking=False):
+            return
+        try:
+            threading.Thread(target=self._update, name="kpi-engine", daemon=True).start()
+        except Exception:
+            self._atualizando.release()
+            raise
+
+    def _update(self):
+        try:
+            with self._session_factory() as db:
+                self._snap = self._refresh(db, self._snap) if self._snap else self._full_load(db)
+        except MemoryBudgetExceeded as e:
+            logger.warning(f"Motor de KPIs desligado, usando SQL: {e}")
+            self._snap = None
+            self._desligado_ate = time.monotonic() + RETRY_S
+        except Exception:
+            logger.exception("Falha ao atualizar o motor de KPIs; consultas seguem no SQL")
+        finally:
+            self._atualizando.release()
+
+    def _full_load(self, db: Session) -> Snapshot:
+        _check_budget(db.execute(select(func.count()).select_from(Medicao)).scalar())
+        t0 = time.perf_counter()
+        # Versões antes dos dados: uma gravação no meio da carga deixa a versão
+        # "velha" no snapshot e é recarregada na próxima verificação
+        versoes = dict(db.execute(select(FazendaVersao.fazenda_id, FazendaVersao.versao)).all())
+        nomes = dict(db.execute(select(Fazenda.id, Fazenda.nome)).all())
+        keys, vals = _load_medicoes(db)
+        snap = Snapshot(keys, vals, nomes, versoes)
+        logger.info(f"Motor de KPIs: {len(keys)} linhas, {snap.nbytes / 1e6:.1f} MB em {time.perf_counter() - t0:.2f}s")
+        return snap
+
+    def _refresh(self, db: Session, snap: Snapshot) -> Snapshot:
+        alteradas, novas = _pendentes(db, snap)
+        if not alteradas and not novas:
+            return snap
+
+        keys, vals = snap.keys, snap.vals
+        if alteradas:
+            ids = np.fromiter(alteradas, dtype=np.int64)
+            manter = ~np.isin(keys // STRIDE, ids)
+            novas_keys, novas_vals = _load_medicoes(db, list(alteradas))
+            _check_budget(int(manter.sum()) + len(novas_keys))
+            keys = np.concatenate((keys[manter], novas_keys))
+            vals = np.concatenate((vals[manter], novas_vals))
+            order = np.argsort(keys, kind="stable")
+            keys, vals = keys[order], vals[order]
+        return Snapshot(keys, vals, {**snap.nomes, **novas}, {**snap.versoes, **alteradas})
+
+
+# Motor do banco da aplicação (DATABASE_URL)
+_engine = KPIEngine(SessionLocal)
+
+
+def preload():
+    """Inicia a carga em segundo plano (startup), para a primeira consulta já achar o índice."""
+    _engine.schedule()
+
+
+def snapshot(db: Session) -> Snapshot | None:
+    return _engine.current(db)
@@ -0,0 +1,41 @@
+"""
+Gravação de medições reprodutivas.
+
+Cada (fazenda_id, data) tem uma única linha em `medicoes`: reenvios (retries do
+app, planilha importada de novo) sobrescrevem os valores com um único
+`INSERT ... ON CONFLICT DO UPDATE` em vez de duplicar linhas.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.medicao import Medicao, MEDIDAS
+from app.services.data_version import bump_farm_versions
+from app.services.rollup import refresh_buckets
+
+
+def upsert_medicoes(db: Session, medicoes) -> int:
+    """
+    Grava medições {fazenda_id, data, aptas, inseminadas, gestantes, partos}; a
+    última de cada (fazenda_id, data) vale, inclusive dentro do mesmo lote.
+    Atualiza os buckets mensais afetados e a versão das fazendas na mesma
+    transação. Não faz commit. Retorna as linhas gravadas.
+    """
+    rows = list({(m["fazenda_id"], m["data"]): m for m in medicoes}.values())
+    if not rows:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        ins = (sqlite_insert if dialect == "sqlite" else pg_insert)(Medicao.__table__)
+        db.execute(ins.on_conflict_do_update(
+            index_elements=["fazenda_id", "data"],
+            set_={c: ins.excluded[c] for c in MEDIDAS},
+        ), rows)
+    else:
+        for r in rows:
+            db.merge(Medicao(**r))
+        db.flush()
+
+    refresh_buckets(db, {(r["fazenda_id"], r["data"]) for r in rows})
+    bump_farm_versions(db, (r["fazenda_id"] for r in rows))
+    return len(rows)
@@ -0,0 +1,107 @@
+"""
+Exportação de relatórios de várias fazendas de uma vez.
+
+Os KPIs vêm de uma única consulta (`compute_kpis_for_farms`); a renderização,
+que é CPU-bound, roda num ProcessPoolExecutor compartilhado e o ZIP é montado
+em streaming à medida que cada arquivo fica pronto.
+"""
+import asyncio
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from fastapi.concurrency import run_in_threadpool
+from app.core import profiling
+from app.core.config import settings
+from app.core.logging import logger
+
+FORMATS = ("pdf", "xlsx")
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def render_pool() -> ProcessPoolExecutor:
+    """Pool de processos para renderização, criado no primeiro uso."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.REPORT_WORKERS or os.cpu_count())
+    return _pool
+
+def shutdown_render_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+def render_bytes(fmt: str, k: dict, inicio: date, fim: date) -> bytes:
+    """Renderiza um relatório em memória (executado nos processos do pool)."""
+    from app.services.reports import render_pdf, render_xlsx
+
+    buf = io.BytesIO()
+    (render_pdf if fmt == "pdf" else render_xlsx)(buf, k, inicio, fim)
+    return buf.getvalue()
+
+def batch_filename(k: dict, fmt: str) -> str:
+    prefixo = "Relatorio" if fmt == "pdf" else "Export"
+    return f"{prefixo}_Fazenda_{k['fazenda_id']}.{fmt}"
+
+
+class _ZipSink(io.RawIOBase):
+    # Destino sem seek para o ZipFile: acumula os bytes até o próximo `drain`
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_zip(ks: list[dict], inicio: date, fim: date, fmt: str):
+    """
+    Gera os bytes de um ZIP com um relatório por fazenda, renderizados em paralelo.
+    Cada arquivo entra no ZIP (e é enviado) assim que o processo termina.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato inválido: {fmt}")
+    sink = _ZipSink()
+    erros = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        futures = {render_pool().submit(render_bytes, fmt, k, inicio, fim): k for k in ks}
+        for fut in as_completed(futures):
+            k = futures[fut]
+            try:
+                zf.writestr(batch_filename(k, fmt), fut.result())
+            except Exception as e:
+                erros.append(f"{k['fazenda_id']} - {k['fazenda_nome']}: {e}")
+            yield sink.drain()
+        if erros:
+            logger.warning(f"Lote de relatórios com {len(erros)} falhas")
+            zf.writestr("ERROS.txt", "\n".join(erros))
+    yield sink.drain()
+
+def render_combined_bytes(ks: list[dict], inicio: date, fim: date) -> bytes:
+    """PDF único com uma página por fazenda (executado nos processos do pool)."""
+    from app.services.reports import render_combined_pdf
+
+    buf = io.BytesIO()
+    render_combined_pdf(buf, ks, inicio, fim)
+    return buf.getvalue()
+
+async def run_in_render_pool(fn, *args):
+    """
+    Executa `fn` no pool de processos sem bloquear o event loop. Numa requisição
+    com profiling ativo, roda no threadpool para o trabalho entrar no profile.
+    """
+    if profiling.active() is not None:
+        return await run_in_threadpool(profiling.call_profiled, fn, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(render_pool(), fn, *args)
@@ -0,0 +1,84 @@
+"""
+Cache em disco dos relatórios PDF/XLSX.
+
+A chave é um hash de (fazenda_id, inicio, fim, formato, versão dos dados da fazenda);
+ela também serve de ETag. Como a ingestão renova a versão, dados novos geram
+chave nova e as entradas antigas saem pela política LRU (limite de tamanho em disco).
+"""
+import hashlib
+import os
+import tempfile
+from datetime import date
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.data_version import get_farm_version
+
+# Mudou o layout dos relatórios? Incremente para invalidar o cache.
+TEMPLATE_VERSION = 1
+FORMATS = ("pdf", "xlsx")
+
+
+def report_key(db: Session, fazenda_id: int, inicio: date, fim: date, fmt: str) -> str:
+    versao = get_farm_version(db, fazenda_id)
+    raw = f"{TEMPLATE_VERSION}|{fazenda_id}|{inicio}|{fim}|{fmt}|{versao}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+def _path(key: str, fmt: str) -> str:
+    return os.path.join(settings.REPORT_CACHE_DIR, f"{key}.{fmt}")
+
+def open_cached(key: str, fmt: str):
+    """Abre a entrada do cache (ou None). O arquivo aberto sobrevive a uma remoção pela LRU."""
+    path = _path(key, fmt)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    os.utime(path)  # marca como usado recentemente (LRU)
+    return f
+
+def put(key: str, fmt: str, data: bytes):
+    os.makedirs(settings.REPORT_CACHE_DIR, exist_ok=True)
+    # Escrita atômica: outro worker nunca lê um arquivo pela metade
+    fd, tmp = tempfile.mkstemp(dir=settings.REPORT_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, _path(key, fmt))
+    _evict()
+
+def _evict():
+    limite = settings.REPORT_CACHE_MAX_MB * 1024 * 1024
+    entradas = []
+    with os.scandir(settings.REPORT_CACHE_DIR) as it:
+        for e in it:
+            if e.is_file() and e.name.endswith(FORMATS):
+                st = e.stat()
+                entradas.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in entradas)
+    for _, size, path in sorted(entradas):
+        if total <= limite:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+    logger.debug(f"Cache de relatórios: {total} bytes")
+
+def store(key: str, fazenda_id: int, inicio: date, fim: date, fmt: str, data: bytes):
+    """Guarda um relatório recém-gerado no cache (e em out/, se REPORT_SAVE_COPY)."""
+    put(key, fmt, data)
+    if settings.REPORT_SAVE_COPY:
+        _save_copy(fazenda_id, inicio, fim, fmt, data)
+
+def _save_copy(fazenda_id: int, inicio: date, fim: date, fmt: str, data: bytes):
+    # Cópia opcional em out/, com o mesmo nome usado pelos builders
+    from app.services.reports import OUT_DIR
+
+    prefixo = "Relatorio" if fmt == "pdf" else "Export"
+    os.makedirs(OUT_DIR, exist_ok=True)
+    destino = os.path.join(OUT_DIR, f"{prefixo}_Fazenda_{fazenda_id}_{inicio}_{fim}.{fmt}")
+    fd, tmp = tempfile.mkstemp(dir=OUT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, destino)
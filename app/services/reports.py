@@ -6,38 +6,97 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.lib.units import cm
-from app.models.fazenda import Fazenda
+from app.core.profiling import hot_path
 from app.services.kpi import compute_kpis_for_farm
 
+OUT_DIR = "out"
 
-def build_pdf_report(db: Session, fazenda_id: int, inicio: date, fim: date) -> str:
+
+def _default_path(filename: str) -> str:
+    os.makedirs(OUT_DIR, exist_ok=True)
+    return os.path.join(OUT_DIR, filename)
+
+
+@hot_path
+def build_pdf_report(db: Session, fazenda_id: int, inicio: date, fim: date, output=None):
     """
     Gera o relatório reprodutivo em PDF com base nas métricas da fazenda.
     Inclui interpretação automática dos indicadores.
+    `output` pode ser um caminho ou um buffer binário (ex.: BytesIO); sem ele,
+    grava em out/Relatorio_Fazenda_{id}_{inicio}_{fim}.pdf. Retorna `output`.
     """
 
-    # Busca a fazenda
-    farm = db.get(Fazenda, fazenda_id)
-    if not farm:
-        raise ValueError("Fazenda não encontrada")
-
-    # Calcula os KPIs
+    # Calcula os KPIs (a consulta também valida a fazenda)
     k = compute_kpis_for_farm(db, fazenda_id, inicio, fim)
 
     # Cria diretório de saída
-    out_dir = "out"
-    os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, f"Relatorio_Fazenda_{farm.id}_{inicio}_{fim}.pdf")
+    if output is None:
+        output = _default_path(f"Relatorio_Fazenda_{fazenda_id}_{inicio}_{fim}.pdf")
+
+    render_pdf(output, k, inicio, fim)
+    return output
 
+
+def render_pdf(output, k: dict, inicio: date, fim: date):
+    """
+    Desenha o PDF a partir do resultado de `compute_kpis_for_farm`.
+    Não acessa o banco: pode rodar em outro processo.
+    """
     # Inicializa o PDF
-    c = canvas.Canvas(path, pagesize=A4)
+    c = canvas.Canvas(output, pagesize=A4)
+    _draw_page(c, k, inicio, fim)
+    c.save()
+
+
+def render_combined_pdf(output, ks: list[dict], inicio: date, fim: date):
+    """
+    Um único PDF com uma página por fazenda. O cabeçalho da tabela e o rodapé
+    são desenhados uma vez como forms do reportlab e reutilizados em cada página.
+    """
+    c = canvas.Canvas(output, pagesize=A4)
+    c.beginForm("cabecalho_tabela")
+    _draw_table_header(c)
+    c.endForm()
+    c.beginForm("rodape")
+    _draw_footer(c)
+    c.endForm()
+    for k in ks:
+        _draw_page(c, k, inicio, fim, forms=True)
+    c.save()
+
+
+# Posição da tabela de totais
+TABLE_X = 2 * cm
+TABLE_Y = A4[1] - 9 * cm
+COL_W = [3.2 * cm, 3.2 * cm, 3.2 * cm, 3.6 * cm, 3.6 * cm]
+ROW_H = 1 * cm
+TABLE_HEADERS = ["Aptas", "Inseminadas", "Gestantes", "Partos Realizados", "Partos Previstos"]
+
+
+def _draw_table_header(c):
+    c.setFillColorRGB(0.9, 0.9, 0.9)
+    c.rect(TABLE_X, TABLE_Y, sum(COL_W), ROW_H, fill=True, stroke=False)
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 10)
+    for i, text in enumerate(TABLE_HEADERS):
+        c.drawString(TABLE_X + sum(COL_W[:i]) + 0.2 * cm, TABLE_Y + 0.3 * cm, text)
+
+
+def _draw_footer(c):
+    c.setFont("Helvetica-Oblique", 9)
+    c.drawString(2 * cm, 1.5 * cm, "Gerado automaticamente por AgroVet Metrics (MVP)")
+
+
+def _draw_page(c, k: dict, inicio: date, fim: date, forms: bool = False):
+    # forms=True: usa os forms "cabecalho_tabela" e "rodape" já definidos no canvas
+    nome = k["fazenda_nome"]
     w, h = A4
 
     # ==========================================================
     # Cabeçalho
     # ==========================================================
     c.setFont("Helvetica-Bold", 16)
-    c.drawString(2 * cm, h - 2 * cm, f"Relatório Reprodutivo - {farm.nome}")
+    c.drawString(2 * cm, h - 2 * cm, f"Relatório Reprodutivo - {nome}")
     c.setFont("Helvetica", 10)
     c.drawString(2 * cm, h - 2.7 * cm, f"Período: {inicio} a {fim}")
 
@@ -62,41 +121,32 @@ def build_pdf_report(db: Session, fazenda_id: int, inicio: date, fim: date) -> s
     # ==========================================================
     # Tabela de totais
     # ==========================================================
-    data = [
-        ["Aptas", "Inseminadas", "Gestantes", "Partos Realizados", "Partos Previstos"],
-        [
-            str(k["totais"]["aptas"]),
-            str(k["totais"]["inseminadas"]),
-            str(k["totais"]["gestantes"]),
-            str(k["totais"]["partos_realizados"]),
-            str(k["totais"]["partos_previstos"]),
-        ],
+    valores = [
+        str(k["totais"]["aptas"]),
+        str(k["totais"]["inseminadas"]),
+        str(k["totais"]["gestantes"]),
+        str(k["totais"]["partos_realizados"]),
+        str(k["totais"]["partos_previstos"]),
     ]
-    table_x = 2 * cm
-    table_y = h - 9 * cm
-    col_w = [3.2 * cm, 3.2 * cm, 3.2 * cm, 3.6 * cm, 3.6 * cm]
-    row_h = 1 * cm
 
     # Cabeçalho da tabela
-    c.setFillColorRGB(0.9, 0.9, 0.9)
-    c.rect(table_x, table_y, sum(col_w), row_h, fill=True, stroke=False)
-    c.setFillColor(colors.black)
-    c.setFont("Helvetica-Bold", 10)
-    for i, text in enumerate(data[0]):
-        c.drawString(table_x + sum(col_w[:i]) + 0.2 * cm, table_y + 0.3 * cm, text)
+    if forms:
+        c.doForm("cabecalho_tabela")
+    else:
+        _draw_table_header(c)
 
     # Linhas de dados
     c.setFont("Helvetica", 10)
-    for i, text in enumerate(data[1]):
-        c.drawString(table_x + sum(col_w[:i]) + 0.2 * cm, table_y - 0.7 * cm, text)
-    c.rect(table_x, table_y - row_h, sum(col_w), 2 * row_h, fill=False)
+    for i, text in enumerate(valores):
+        c.drawString(TABLE_X + sum(COL_W[:i]) + 0.2 * cm, TABLE_Y - 0.7 * cm, text)
+    c.rect(TABLE_X, TABLE_Y - ROW_H, sum(COL_W), 2 * ROW_H, fill=False)
 
     # ==========================================================
     # Interpretação automática
     # ==========================================================
     ts, tc, tp = k['kpis']['TS'], k['kpis']['TC'], k['kpis']['TP']
     texto = (
-        f"A Fazenda {farm.nome} apresenta uma Taxa de Serviço (TS) de {ts}%, "
+        f"A Fazenda {nome} apresenta uma Taxa de Serviço (TS) de {ts}%, "
         f"Taxa de Concepção (TC) de {tc}% e Taxa de Prenhez (TP) de {tp}%. "
         "Esses valores indicam desempenho reprodutivo compatível com sistemas "
         "de inseminação artificial convencionais. A análise conjunta dos índices "
@@ -115,33 +165,37 @@ def build_pdf_report(db: Session, fazenda_id: int, inicio: date, fim: date) -> s
     # ==========================================================
     # Rodapé
     # ==========================================================
-    c.setFont("Helvetica-Oblique", 9)
-    c.drawString(2 * cm, 1.5 * cm, "Gerado automaticamente por AgroVet Metrics (MVP)")
+    if forms:
+        c.doForm("rodape")
+    else:
+        _draw_footer(c)
 
     c.showPage()
-    c.save()
-    return path
 
     # ==========================================================
 # Exportação em Excel (XLSX)
 # ==========================================================
 from openpyxl import Workbook
 
-def build_xlsx_export(db: Session, fazenda_id: int, inicio: date, fim: date) -> str:
+@hot_path
+def build_xlsx_export(db: Session, fazenda_id: int, inicio: date, fim: date, output=None):
     """
     Gera o relatório reprodutivo em formato Excel (XLSX).
     Contém os mesmos dados e KPIs usados no PDF.
+    `output` pode ser um caminho ou um buffer binário; sem ele,
+    grava em out/Export_Fazenda_{id}_{inicio}_{fim}.xlsx. Retorna `output`.
     """
-    farm = db.get(Fazenda, fazenda_id)
-    if not farm:
-        raise ValueError("Fazenda não encontrada")
-
     k = compute_kpis_for_farm(db, fazenda_id, inicio, fim)
 
-    out_dir = "out"
-    os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, f"Export_Fazenda_{farm.id}_{inicio}_{fim}.xlsx")
+    if output is None:
+        output = _default_path(f"Export_Fazenda_{fazenda_id}_{inicio}_{fim}.xlsx")
+
+    render_xlsx(output, k, inicio, fim)
+    return output
+
 
+def render_xlsx(output, k: dict, inicio: date, fim: date):
+    """Monta a planilha a partir do resultado de `compute_kpis_for_farm`."""
     wb = Workbook()
     ws = wb.active
     ws.title = "Resumo"
@@ -162,7 +216,7 @@ def build_xlsx_export(db: Session, fazenda_id: int, inicio: date, fim: date) ->
     ws.append(headers)
 
     ws.append([
-        farm.nome,
+        k["fazenda_nome"],
         str(inicio),
         str(fim),
         k["kpis"]["TS"],
@@ -180,6 +234,5 @@ def build_xlsx_export(db: Session, fazenda_id: int, inicio: date, fim: date) ->
         max_length = max(len(str(cell.value)) for cell in col if cell.value)
         ws.column_dimensions[col[0].column_letter].width = max_length + 2
 
-    wb.save(path)
-    return path
+    wb.save(output)
 
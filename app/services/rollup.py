@@ -0,0 +1,160 @@
+"""
+Manutenção da tabela de somas mensais (`medicoes_mensal`).
+
+A gravação de medições (`app.services.medicoes`) recalcula os buckets dos meses
+que tocou na mesma transação (`refresh_buckets`); as consultas de KPI usam os
+meses inteiros daqui e leem `medicoes` apenas nas bordas parciais do intervalo.
+
+Reconstrução completa (backfill):
+    python -m app.services.rollup
+"""
+from datetime import date, timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, delete, insert, literal_column, cast, Date, bindparam, BigInteger, ARRAY
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.medicao import Medicao, MEDIDAS
+from app.models.medicao_mensal import MedicaoMensal
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+def next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def split_range(inicio: date, fim: date):
+    """
+    Divide [inicio, fim] em bordas parciais (lidas dos eventos brutos) e no
+    intervalo de meses inteiros (primeiro e último mês) coberto pelos buckets.
+    """
+    first = inicio if inicio.day == 1 else next_month(inicio)
+    last_end = fim if next_month(fim) - timedelta(days=1) == fim else month_start(fim) - timedelta(days=1)
+    if not settings.KPI_USE_ROLLUP or first > last_end:
+        return [(inicio, fim)], None
+
+    bordas = []
+    if inicio < first:
+        bordas.append((inicio, first - timedelta(days=1)))
+    if last_end < fim:
+        bordas.append((last_end + timedelta(days=1), fim))
+    return bordas, (first, month_start(last_end))
+
+def window_selects(inicio: date, fim: date, colunas: dict[str, str | None], fazenda_id: int | None = None):
+    """
+    SELECTs (fazenda_id, *colunas) que, unidos, cobrem as medições do intervalo.
+    `colunas` mapeia cada rótulo de saída para a medida de origem (None = 0),
+    ex.: {"partos_previstos": "gestantes"}.
+    """
+    def _select(model, cond):
+        cols = [
+            (getattr(model, origem) if origem else literal_column("0")).label(rotulo)
+            for rotulo, origem in colunas.items()
+        ]
+        stmt = select(model.fazenda_id, *cols).where(cond)
+        if fazenda_id is not None:
+            stmt = stmt.where(model.fazenda_id == fazenda_id)
+        return stmt
+
+    bordas, meses = split_range(inicio, fim)
+    selects = [_select(Medicao, Medicao.data.between(a, b)) for a, b in bordas]
+    if meses:
+        selects.append(_select(MedicaoMensal, MedicaoMensal.mes.between(*meses)))
+    return selects
+
+def _month_bucket(dialect: str):
+    if dialect == "sqlite":
+        return func.date(Medicao.data, "start of month")
+    return cast(func.date_trunc("month", Medicao.data), Date)
+
+def _somas():
+    return [func.sum(getattr(Medicao, c)) for c in MEDIDAS]
+
+
+def refresh_buckets(db: Session, pares):
+    """
+    Recalcula a partir de `medicoes` os buckets dos pares (fazenda_id, mês)
+    afetados por um upsert. Diferente de somar deltas, o resultado não depende
+    do valor anterior da medição (reenvios e correções sobrescrevem). Não faz commit.
+    """
+    pares = sorted({(f, month_start(d)) for f, d in pares})
+    if not pares:
+        return
+    rows = [{"f": f, "mes": mes, "fim": next_month(mes) - timedelta(days=1)} for f, mes in pares]
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        for r in rows:
+            somas = db.execute(select(*_somas()).where(
+                Medicao.fazenda_id == r["f"], Medicao.data.between(r["mes"], r["fim"])
+            )).one()
+            db.merge(MedicaoMensal(fazenda_id=r["f"], mes=r["mes"],
+                                   **{c: int(v or 0) for c, v in zip(MEDIDAS, somas)}))
+        return
+
+    # Um único comando (compilado uma vez) executado por par; cada execução lê só
+    # a faixa do mês na chave primária de `medicoes`
+    src = (
+        select(Medicao.fazenda_id, bindparam("mes", type_=Date), *_somas())
+        .where(Medicao.fazenda_id == bindparam("f"),
+               Medicao.data.between(bindparam("mes", type_=Date), bindparam("fim", type_=Date)))
+        .group_by(Medicao.fazenda_id)
+    )
+    if dialect == "postgresql":
+        _lock_buckets(db, pares)
+    ins = (sqlite_insert if dialect == "sqlite" else pg_insert)(MedicaoMensal.__table__)
+    ins = ins.from_select(["fazenda_id", "mes", *MEDIDAS], src)
+    db.execute(ins.on_conflict_do_update(
+        index_elements=["fazenda_id", "mes"],
+        set_={c: ins.excluded[c] for c in MEDIDAS},
+    ), rows)
+
+
+def _lock_buckets(db: Session, pares):
+    """
+    Postgres: trava cada (fazenda_id, mês) até o fim da transação antes do
+    recálculo. Em READ COMMITTED, dois upserts simultâneos em dias diferentes do
+    mesmo mês calculariam cada um uma soma sem a linha do outro, e a última
+    gravação (incompleta) ficaria no bucket; com a trava, o segundo só soma depois
+    do commit do primeiro. As chaves vão em ordem, para não haver deadlock.
+    """
+    chaves = [(f << 20) | (mes.year * 12 + mes.month - 1) for f, mes in pares]
+    k = func.unnest(bindparam("chaves", type_=ARRAY(BigInteger))).column_valued("k")
+    ordenadas = select(k).order_by(k).subquery()
+    db.execute(select(func.pg_advisory_xact_lock(ordenadas.c.k)), {"chaves": chaves}).all()
+
+def rebuild_rollups(db: Session) -> int:
+    """Recalcula todos os buckets mensais a partir de `medicoes`."""
+    dialect = db.get_bind().dialect.name
+    db.execute(delete(MedicaoMensal))
+    if dialect in ("sqlite", "postgresql"):
+        mes = _month_bucket(dialect)
+        src = select(Medicao.fazenda_id, mes, *_somas()).group_by(Medicao.fazenda_id, mes)
+        db.execute(insert(MedicaoMensal).from_select(["fazenda_id", "mes", *MEDIDAS], src))
+    else:
+        refresh_buckets(db, db.execute(select(Medicao.fazenda_id, Medicao.data)).all())
+    db.commit()
+    total = db.execute(select(func.count()).select_from(MedicaoMensal)).scalar()
+    logger.info(f"Buckets mensais reconstruídos: {total}")
+    return total
+
+def ensure_rollups(db: Session):
+    """
+    Faz o backfill na primeira execução, quando a tabela mensal ainda está vazia.
+    Roda mesmo com KPI_USE_ROLLUP=0: a gravação mantém os buckets de qualquer
+    forma, e uma tabela parcial não seria completada ao ligar a flag depois.
+    """
+    if db.execute(select(MedicaoMensal.fazenda_id).limit(1)).first():
+        return
+    if db.execute(select(Medicao.fazenda_id).limit(1)).first():
+        rebuild_rollups(db)
+
+
+if __name__ == "__main__":
+    from app.models.base import SessionLocal
+    from app.models.migrate import migrate
+
+    # Schema completo (todas as tabelas e a conversão do layout antigo) antes de reconstruir
+    migrate()
+    with SessionLocal() as db:
+        rebuild_rollups(db)
@@ -0,0 +1,124 @@
+"""
+Benchmark de concorrência leitura/escrita no SQLite.
+
+Roda escritores (ingestão em lote) e leitores (KPIs) em processos sobre o mesmo
+arquivo durante alguns segundos e mede operações/s e erros de lock, com os
+pragmas padrão do SQLite ("antes") e com WAL/busy_timeout/mmap ("depois").
+Cada modo roda num subprocesso, porque `settings` é lido na importação.
+
+Uso:
+    python -m benchmarks.concurrency [--segundos 10] [--escritores 4] [--leitores 8]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+MODOS = {
+    "antes": {"SQLITE_WAL": "0", "SQLITE_BUSY_TIMEOUT_MS": "0", "SQLITE_MMAP_MB": "0", "SQLITE_CACHE_MB": "0"},
+    "depois": {},
+}
+FAZENDAS = 20
+LINHAS_POR_LOTE = 50
+
+
+def _payloads(rng: random.Random):
+    from app.schemas.ingest import MobileInput
+
+    inicio = date(2024, 1, 1)
+    out = []
+    for _ in range(LINHAS_POR_LOTE):
+        aptas = rng.randint(10, 100)
+        ins = rng.randint(0, aptas)
+        out.append(MobileInput(
+            fazenda=f"Fazenda {rng.randrange(FAZENDAS)}",
+            data=inicio + timedelta(days=rng.randrange(365)),
+            aptas=aptas, inseminadas=ins, gestantes=rng.randint(0, ins), partos=rng.randint(0, 10),
+        ))
+    return out
+
+
+def _worker(tipo: str, seed: int, segundos: float) -> tuple[int, int]:
+    """Um processo escritor ou leitor; devolve (operações ok, erros)."""
+    from app.models.base import SessionLocal
+    from app.services.ingest import bulk_insert_inputs
+    from app.services.kpi import compute_kpis_for_farm
+
+    rng = random.Random(seed)
+    ok = erros = 0
+    fim = time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        with SessionLocal() as db:
+            try:
+                if tipo == "escrita":
+                    if bulk_insert_inputs(db, _payloads(rng))["inseridas"]:
+                        ok += 1
+                    else:
+                        erros += 1
+                else:
+                    compute_kpis_for_farm(db, rng.randint(1, FAZENDAS), date(2024, 1, 1), date(2024, 12, 31))
+                    ok += 1
+            except Exception:
+                erros += 1
+    return ok, erros
+
+
+def _run(segundos: float, escritores: int, leitores: int) -> dict:
+    from app.models.base import Base, SessionLocal, engine
+    from app.services.ingest import bulk_insert_inputs
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        bulk_insert_inputs(db, _payloads(random.Random(0)) * 4)
+    engine.dispose()
+
+    # Processos, como vários workers do uvicorn disputando o mesmo arquivo
+    tarefas = [("escrita", i) for i in range(escritores)] + [("leitura", 1000 + i) for i in range(leitores)]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(tarefas), mp_context=ctx) as pool:
+        futuros = [(tipo, pool.submit(_worker, tipo, seed, segundos)) for tipo, seed in tarefas]
+        stats = {"escritas": 0, "leituras": 0, "erros_escrita": 0, "erros_leitura": 0}
+        for tipo, fut in futuros:
+            ok, erros = fut.result()
+            stats["escritas" if tipo == "escrita" else "leituras"] += ok
+            stats["erros_escrita" if tipo == "escrita" else "erros_leitura"] += erros
+
+    stats["escritas_s"] = round(stats["escritas"] / segundos, 1)
+    stats["leituras_s"] = round(stats["leituras"] / segundos, 1)
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--segundos", type=float, default=10)
+    ap.add_argument("--escritores", type=int, default=4)
+    ap.add_argument("--leitores", type=int, default=8)
+    ap.add_argument("--modo", choices=MODOS)  # uso interno: roda um único modo
+    args = ap.parse_args()
+
+    if args.modo:
+        print(json.dumps(_run(args.segundos, args.escritores, args.leitores)))
+        return
+
+    resultados = {}
+    for modo, env in MODOS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, **env, "DATABASE_URL": f"sqlite:///{tmp}/bench.db"}
+            cmd = [sys.executable, "-m", "benchmarks.concurrency", "--modo", modo,
+                   "--segundos", str(args.segundos), "--escritores", str(args.escritores),
+                   "--leitores", str(args.leitores)]
+            out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True).stdout
+            resultados[modo] = json.loads(out.strip().splitlines()[-1])
+        print(f"{modo:>7}: {resultados[modo]}")
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Gerador determinístico de dados sintéticos para os benchmarks.
+
+A mesma semente gera sempre as mesmas fazendas, medições e planilhas.
+Distribuições aproximam o campo: rebanhos de tamanho log-normal, taxa de
+serviço em torno de 50% e de concepção em torno de 45%, variando por fazenda,
+e medições espalhadas pelos dois anos anteriores a `FIM`.
+"""
+import csv
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+
+FIM = date(2025, 6, 30)
+DIAS = 730
+ESTADOS = {
+    "MG": ["Uberaba", "Patos de Minas", "Governador Valadares", "Montes Claros"],
+    "GO": ["Rio Verde", "Jataí", "Mineiros"],
+    "MT": ["Cáceres", "Juara", "Vila Bela"],
+    "SP": ["Presidente Prudente", "Araçatuba"],
+    "PA": ["Marabá", "Redenção", "São Félix do Xingu"],
+}
+COLUNAS_PLANILHA = ["Fazenda", "Data", "Aptas", "Inseminadas", "Gestantes", "Partos"]
+
+
+def _fazendas(rng: random.Random, n: int) -> list[dict]:
+    out = []
+    for i in range(n):
+        estado = rng.choice(sorted(ESTADOS))
+        out.append({
+            "nome": f"Fazenda {i:05d}",
+            "produtor": f"Produtor {rng.randrange(max(1, n // 4)):04d}",
+            "municipio": rng.choice(ESTADOS[estado]),
+            "estado": estado,
+            # parâmetros de cada fazenda para as medições
+            "rebanho": max(20, int(rng.lognormvariate(5.0, 0.8))),
+            "ts": min(0.95, max(0.1, rng.gauss(0.5, 0.12))),
+            "tc": min(0.9, max(0.1, rng.gauss(0.45, 0.1))),
+        })
+    return out
+
+
+def _medicao(rng: random.Random, faz: dict) -> tuple:
+    aptas = max(1, int(faz["rebanho"] * rng.uniform(0.05, 0.3)))
+    inseminadas = sum(rng.random() < faz["ts"] for _ in range(aptas))
+    gestantes = sum(rng.random() < faz["tc"] for _ in range(inseminadas))
+    partos = int(gestantes * rng.uniform(0.0, 0.8))
+    data = FIM - timedelta(days=rng.randrange(DIAS))
+    return data, aptas, inseminadas, gestantes, partos
+
+
+def seed_database(db, n_fazendas: int, n_eventos: int, seed: int = 42) -> dict:
+    """
+    Cria `n_fazendas` fazendas e até `n_eventos / 4` medições (o equivalente a
+    `n_eventos` linhas no layout antigo, uma por tipo), reconstruindo os buckets
+    mensais no final.
+    """
+    from sqlalchemy import insert
+    from app.models.fazenda import Fazenda
+    from app.models.medicao import Medicao
+    from app.services.kpi import TIPOS
+    from app.services.rollup import rebuild_rollups
+
+    rng = random.Random(seed)
+    fazendas = _fazendas(rng, n_fazendas)
+    db.execute(insert(Fazenda.__table__), [
+        {k: f[k] for k in ("nome", "produtor", "municipio", "estado")} for f in fazendas
+    ])
+    ids = dict(db.execute(Fazenda.__table__.select().with_only_columns(Fazenda.nome, Fazenda.id)).all())
+
+    # Rebanhos maiores têm mais medições
+    n_medicoes = max(1, n_eventos // len(TIPOS))
+    sorteio = rng.choices(fazendas, cum_weights=list(accumulate(f["rebanho"] for f in fazendas)), k=n_medicoes)
+    # Uma medição por fazenda/dia (chave de `medicoes`): a última sorteada vale
+    medicoes = {}
+    for faz in sorteio:
+        data, *valores = _medicao(rng, faz)
+        medicoes[(ids[faz["nome"]], data)] = valores
+    linhas = [
+        {"fazenda_id": fazenda_id, "data": data, **dict(zip(TIPOS, valores))}
+        for (fazenda_id, data), valores in medicoes.items()
+    ]
+    for i in range(0, len(linhas), 20000):
+        db.execute(insert(Medicao.__table__), linhas[i:i + 20000])
+    db.commit()
+    rebuild_rollups(db)
+    return {"fazendas": n_fazendas, "medicoes": len(medicoes), "eventos": len(medicoes) * len(TIPOS)}
+
+
+def mobile_inputs(n: int, n_fazendas: int, seed: int = 7) -> list:
+    """Payloads MobileInput para fazendas existentes (nomes do `seed_database`)."""
+    from app.schemas.ingest import MobileInput
+
+    rng = random.Random(seed)
+    fazendas = _fazendas(random.Random(42), n_fazendas)
+    out = []
+    for _ in range(n):
+        faz = rng.choice(fazendas)
+        data, aptas, ins, gest, partos = _medicao(rng, faz)
+        out.append(MobileInput(fazenda=faz["nome"], data=data, aptas=aptas,
+                               inseminadas=ins, gestantes=gest, partos=partos))
+    return out
+
+
+def write_sheet(path: str, n_linhas: int, n_fazendas: int, seed: int = 11, invalidas: float = 0.01) -> str:
+    """
+    Planilha CSV ou XLSX (pela extensão) no formato aceito por /ingest/upload,
+    com uma fração de linhas inválidas (texto, negativos, incoerentes).
+    """
+    rng = random.Random(seed)
+    fazendas = _fazendas(random.Random(42), n_fazendas)
+    linhas = []
+    for _ in range(n_linhas):
+        faz = rng.choice(fazendas)
+        data, aptas, ins, gest, partos = _medicao(rng, faz)
+        linha = [faz["nome"], data.isoformat(), aptas, ins, gest, partos]
+        if rng.random() < invalidas:
+            col = rng.randrange(1, 6)
+            linha[col] = rng.choice(["x", -1, None]) if col > 1 else "31/02/2024"
+        linhas.append(linha)
+
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(COLUNAS_PLANILHA)
+            w.writerows(linhas)
+        return path
+
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(COLUNAS_PLANILHA)
+    for linha in linhas:
+        ws.append(linha)
+    wb.save(path)
+    return path
@@ -0,0 +1,63 @@
+"""
+Tempo de importação da API medido com `python -X importtime`.
+
+Falha (código de saída 1) se `import app.api.main` carregar dependências
+pesadas que devem ficar para o primeiro uso (pandas, reportlab, openpyxl...)
+ou se passar de `--limite-ms`.
+
+Uso:
+    python -m benchmarks.importtime [--modulo app.api.main] [--limite-ms 1500]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Carregadas só no primeiro upload/relatório
+LAZY_MODULES = ("pandas", "numpy", "reportlab", "openpyxl")
+
+
+def measure(modulo: str = "app.api.main") -> dict:
+    """Importa `modulo` num processo novo e devolve o tempo total e os módulos mais lentos."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    # Linhas no formato "import time: <self us> | <cumulativo us> | <módulo>"
+    tempos = {}
+    for linha in proc.stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, cumulativo, nome = linha[len("import time:"):].split("|")
+        tempos[nome.strip()] = int(cumulativo)
+    outros = sorted(((n, t) for n, t in tempos.items() if n != modulo), key=lambda x: -x[1])
+    return {
+        "modulo": modulo,
+        "total_ms": round(tempos.get(modulo, 0) / 1000, 1),
+        "mais_lentos_ms": {n: round(t / 1000, 1) for n, t in outros[:10]},
+        "pesados_carregados": sorted(m for m in LAZY_MODULES if m in tempos),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modulo", default="app.api.main")
+    ap.add_argument("--limite-ms", type=float, default=None)
+    args = ap.parse_args()
+
+    r = measure(args.modulo)
+    print(json.dumps(r, indent=2, ensure_ascii=False))
+    falhas = []
+    if r["pesados_carregados"]:
+        falhas.append(f"dependências pesadas importadas na inicialização: {', '.join(r['pesados_carregados'])}")
+    if args.limite_ms is not None and r["total_ms"] > args.limite_ms:
+        falhas.append(f"importação levou {r['total_ms']} ms (limite {args.limite_ms} ms)")
+    for f in falhas:
+        print(f"ERRO: {f}", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Suíte de benchmarks dos caminhos principais, sobre um arquivo SQLite local,
+mais o tempo de importação da API (ver `benchmarks.importtime`).
+
+Gera a base com `benchmarks.datagen` (sempre os mesmos dados para a mesma
+semente), mede cada caso `--repeticoes` vezes e grava um JSON com tempos
+(ms) e o número de comandos SQL executados por execução. Com `--comparar`,
+mostra a variação em relação a um JSON anterior (ex.: de outro commit).
+
+Uso:
+    python -m benchmarks.run [--fazendas 200] [--eventos 200000] [--saida bench.json]
+    python -m benchmarks.run --comparar bench_main.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+INICIO = date(2024, 7, 1)
+FIM = date(2025, 6, 30)
+
+
+class SQLCounter:
+    """Conta comandos enviados ao banco (executemany conta como um)."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+
+    def attach(self, *engines):
+        from sqlalchemy import event
+
+        for eng in engines:
+            event.listen(eng, "before_cursor_execute", self)
+
+
+def _measure(fn, repeticoes: int, counter: SQLCounter, setup=None) -> dict:
+    tempos, comandos = [], []
+    for _ in range(repeticoes):
+        arg = setup() if setup else None
+        antes = counter.total
+        t0 = time.perf_counter()
+        fn(arg) if setup else fn()
+        tempos.append((time.perf_counter() - t0) * 1000)
+        comandos.append(counter.total - antes)
+    return {
+        "runs": repeticoes,
+        "min_ms": round(min(tempos), 3),
+        "median_ms": round(statistics.median(tempos), 3),
+        "mean_ms": round(statistics.fmean(tempos), 3),
+        "sql_statements": round(statistics.fmean(comandos), 1),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_suite(args, tmp: str) -> dict:
+    # DATABASE_URL precisa estar definido antes de importar o app
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ.setdefault("REPORT_CACHE_DIR", f"{tmp}/cache")
+
+    from fastapi.testclient import TestClient
+    from app.api.main import app
+    from app.models.base import SessionLocal, engine, get_async_engine
+    from app.models.migrate import migrate
+    from app.etl.cleaning import normalize_excel
+    from app.services.kpi import insert_mobile_input, compute_kpis_for_farm, benchmark_metric
+    from app.services.reports import build_pdf_report, build_xlsx_export
+    from benchmarks import datagen, importtime
+
+    migrate()
+    with SessionLocal() as db:
+        t0 = time.perf_counter()
+        dados = datagen.seed_database(db, args.fazendas, args.eventos, seed=args.semente)
+        dados["geracao_s"] = round(time.perf_counter() - t0, 2)
+
+    counter = SQLCounter()
+    counter.attach(engine, get_async_engine().sync_engine)
+
+    planilha_xlsx = datagen.write_sheet(f"{tmp}/upload.xlsx", args.linhas, args.fazendas, seed=args.semente)
+    planilha_csv = datagen.write_sheet(f"{tmp}/upload.csv", args.linhas, args.fazendas, seed=args.semente)
+    payloads = iter(datagen.mobile_inputs(args.repeticoes * 2, args.fazendas, seed=args.semente))
+    rep = args.repeticoes
+    casos = {}
+
+    with SessionLocal() as db, TestClient(app) as client:
+        casos["insert_mobile_input"] = _measure(lambda: insert_mobile_input(db, next(payloads)), rep, counter)
+        casos["compute_kpis_for_farm"] = _measure(lambda: compute_kpis_for_farm(db, 1, INICIO, FIM), rep, counter)
+        casos["benchmark_metric"] = _measure(lambda: benchmark_metric(db, "TP", INICIO, FIM), rep, counter)
+        casos["build_pdf_report"] = _measure(
+            lambda: build_pdf_report(db, 1, INICIO, FIM, output=io.BytesIO()), rep, counter)
+        casos["build_xlsx_export"] = _measure(
+            lambda: build_xlsx_export(db, 1, INICIO, FIM, output=io.BytesIO()), rep, counter)
+        casos["normalize_excel_xlsx"] = _measure(lambda: normalize_excel(planilha_xlsx), rep, counter)
+        casos["normalize_excel_csv"] = _measure(lambda: normalize_excel(planilha_csv), rep, counter)
+
+        def upload(path):
+            def _post():
+                with open(path, "rb") as f:
+                    r = client.post("/ingest/upload", files={"file": (os.path.basename(path), f)})
+                r.raise_for_status()
+            return _post
+
+        casos["ingest_upload_xlsx"] = _measure(upload(planilha_xlsx), rep, counter)
+        casos["ingest_upload_csv"] = _measure(upload(planilha_csv), rep, counter)
+
+    # Importação da API num processo novo (cold start)
+    imp = importtime.measure()
+    casos["import_app_api_main"] = {
+        "runs": 1, "min_ms": imp["total_ms"], "median_ms": imp["total_ms"], "mean_ms": imp["total_ms"],
+        "sql_statements": 0, "pesados_carregados": imp["pesados_carregados"],
+    }
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "parametros": {"fazendas": args.fazendas, "eventos": args.eventos, "linhas": args.linhas,
+                           "repeticoes": rep, "semente": args.semente},
+            "dados": dados,
+        },
+        "casos": casos,
+    }
+
+
+def compare(atual: dict, anterior: dict):
+    print(f"{'caso':<24}{'antes (ms)':>12}{'agora (ms)':>12}{'var.':>9}{'sql antes':>11}{'sql agora':>11}")
+    for nome, c in atual["casos"].items():
+        a = anterior.get("casos", {}).get(nome)
+        if a is None:
+            print(f"{nome:<24}{'-':>12}{c['median_ms']:>12.1f}{'':>9}{'-':>11}{c['sql_statements']:>11}")
+            continue
+        var = (c["median_ms"] / a["median_ms"] - 1) * 100 if a["median_ms"] else 0.0
+        print(f"{nome:<24}{a['median_ms']:>12.1f}{c['median_ms']:>12.1f}{var:>+8.1f}%"
+              f"{a['sql_statements']:>11}{c['sql_statements']:>11}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fazendas", type=int, default=200)
+    ap.add_argument("--eventos", type=int, default=200_000)
+    ap.add_argument("--linhas", type=int, default=5_000, help="linhas das planilhas de upload")
+    ap.add_argument("--repeticoes", type=int, default=5)
+    ap.add_argument("--semente", type=int, default=42)
+    ap.add_argument("--saida", default="-", help="arquivo JSON de saída (- = stdout)")
+    ap.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        resultado = run_suite(args, tmp)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida == "-":
+        print(texto)
+    else:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            compare(resultado, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())